@@ -1,22 +1,100 @@
+import asyncio
+import time
+import uuid
+from contextlib import asynccontextmanager
 from typing import Literal
 from langchain_anthropic import ChatAnthropic
 from pathlib import Path
 from dotenv import load_dotenv
-from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, END
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 from langgraph.prebuilt import ToolNode
-from core.schema import AgentState
-from core.tools import TOOLS, read_file_content, memory
+from core.schema import AgentState, SortDecision
+from core.policy import analysis_policy
+from core.ocr import has_ocr_text
+from core.routing import MODEL_ROUTING, ROUTE_CONFIDENCE_THRESHOLD, conflicts_with_memory, routing_stats
+from core.tools import TOOLS, extract_content, memory_for, near_index, place_file, plan_manifest, storage_for
 
 load_dotenv()
+CHECKPOINT_DB_PATH = "./data/sorterra_checkpoints.sqlite"
+# Near-duplicate pre-stage: "off", "hint" (add to MEMORY HINTS) or "shortcut" (skip the LLMs above the threshold).
+# Overridable per run with configurable["near_duplicate_mode"].
+NEAR_DUPLICATE_MODE = "hint"
+NEAR_DUPLICATE_SHORTCUT_SIMILARITY = 0.9
+# Prompt history for the sorting agent: the request, a one-line log of older actions
+# and the last HISTORY_KEEP_TURNS tool turns verbatim, so the prompt stays flat as the loop grows
+HISTORY_KEEP_TURNS = 2
+HISTORY_LOG_RESULT_CHARS = 160
+HISTORY_LOG_MAX_ENTRIES = 20
+
 # Initialize model
 model_thinking = ChatAnthropic(model="claude-sonnet-4-5-20250929", temperature=0).bind_tools(TOOLS)
 model_quick = ChatAnthropic(model="claude-haiku-4-5-20251001", temperature=0)
+model_decision = model_quick.with_structured_output(SortDecision, include_raw=True)
+
+def _usage(state: AgentState, response, model: str):
+    """Adds a response's token usage to the per-model totals of this decision."""
+    tokens = dict(state.get("decision_tokens") or {})
+    usage = getattr(response, "usage_metadata", None) or {}
+    tokens[model] = tokens.get(model, 0) + usage.get("total_tokens", 0)
+    return tokens
+
+def compact_history(messages, keep_turns: int = HISTORY_KEEP_TURNS):
+    """
+    The messages sorting_agent sends: the original request with older turns
+    folded into an action log, then the latest turns unchanged. A turn is an
+    AI message plus the tool results answering it, so tool calls and results
+    stay paired. The state itself keeps the full history.
+    """
+    request, rest = messages[0], messages[1:]
+    turns = []
+    for message in rest:
+        if isinstance(message, ToolMessage) and turns:
+            turns[-1].append(message)
+        else:
+            turns.append([message])
+    if len(turns) <= keep_turns:
+        return list(messages)
+
+    older, latest = turns[:-keep_turns], turns[-keep_turns:]
+    log = []
+    for ai_message, *results in older:
+        outputs = {r.tool_call_id: " ".join(str(r.content).split()) for r in results}
+        for call in getattr(ai_message, "tool_calls", None) or []:
+            args = ", ".join(f"{k}={v}" for k, v in call["args"].items())
+            output = outputs.get(call["id"], "(no result)")
+            if len(output) > HISTORY_LOG_RESULT_CHARS:
+                output = output[:HISTORY_LOG_RESULT_CHARS] + "..."
+            log.append(f"- {call['name']}({args}) -> {output}")
+        if not getattr(ai_message, "tool_calls", None) and ai_message.content:
+            log.append(f"- note: {' '.join(str(ai_message.content).split())[:HISTORY_LOG_RESULT_CHARS]}")
+    if len(log) > HISTORY_LOG_MAX_ENTRIES:
+        log = [f"- ({len(log) - HISTORY_LOG_MAX_ENTRIES} earlier actions omitted)"] + log[-HISTORY_LOG_MAX_ENTRIES:]
+    summary = HumanMessage(content=f"{request.content}\n\n### Actions so far:\n" + "\n".join(log))
+    return [summary] + [message for turn in latest for message in turn]
+
+def _tool_call(name: str, **args):
+    return {"name": name, "args": args, "id": f"quick_{uuid.uuid4().hex[:12]}", "type": "tool_call"}
 
-def analyzer_node(state: AgentState):
-    """Summarizes full file content and fetches memory hints."""
+async def analyzer_node(state: AgentState, config: RunnableConfig):
+    """Summarizes full file content and fetches memory hints, as the format's analysis policy allows."""
     file_path = state["current_file"]
-    full_content = read_file_content.invoke(file_path)
+    policy = analysis_policy(file_path)
+    content_path = await asyncio.to_thread(storage_for(config).local_copy, file_path)
+    full_content = await asyncio.to_thread(extract_content, content_path, policy["depth"])
+    if has_ocr_text(full_content):
+        # A scan or screenshot with recognized text is analyzed like any document
+        policy = {**policy, "summarize": True, "memory": True}
+
+    vector_memory = memory_for(config, state["recipe"])
+    mode = config.get("configurable", {}).get("near_duplicate_mode", NEAR_DUPLICATE_MODE)
+    near_duplicate = (near_index.query(full_content, vector_memory.collection_name)
+                      if mode != "off" and policy["memory"] else None)
+    if (near_duplicate and mode == "shortcut"
+            and near_duplicate["similarity"] >= NEAR_DUPLICATE_SHORTCUT_SIMILARITY):
+        return {"analysis_summary": f"FILE: {Path(file_path).name}", "near_duplicate": near_duplicate}
     
     summary_prompt = (
         "Analyze the following document and extract key metadata for an automated sorting system. "
@@ -28,8 +106,27 @@ def analyzer_node(state: AgentState):
         f"CONTENT:\n{full_content}"
     )
     
-    file_summary = model_quick.invoke([HumanMessage(content=summary_prompt)]).content
-    past_hints = memory.get_similar_mapping(full_content)
+    if policy["summarize"]:
+        file_summary = (await model_quick.ainvoke([HumanMessage(content=summary_prompt)])).content
+    else:
+        # Compact structured extract (schema, table list, media metadata): no Haiku round trip
+        file_summary = full_content
+
+    if not policy["memory"]:
+        matches, past_hints = [], "Memory not used for this file type."
+    else:
+        try:
+            matches = await asyncio.to_thread(vector_memory.similar_destinations, full_content)
+            past_hints = vector_memory.describe(matches)
+        except Exception as e:
+            matches, past_hints = [], f"Memory access error: {str(e)}"
+    memory_destinations = [destination for destination, _ in matches]
+    if near_duplicate:
+        memory_destinations.append(near_duplicate['destination'])
+        past_hints = (
+            f"Near-duplicate of '{Path(near_duplicate['sorted_path']).name}', previously sorted to "
+            f"'{near_duplicate['destination']}' (Similarity: {near_duplicate['similarity']:.2f})\n{past_hints}"
+        )
     
     analysis = (
         f"FILE: {Path(file_path).name}\n"
@@ -37,16 +134,84 @@ def analyzer_node(state: AgentState):
         f"MEMORY HINTS (PAST ACTIONS):\n{past_hints}"
     )
     
-    return {"analysis_summary": analysis}
+    return {"analysis_summary": analysis, "memory_destinations": memory_destinations}
+
+async def near_duplicate_node(state: AgentState, config: RunnableConfig):
+    """Routes a high-similarity near-duplicate to its twin's destination without any LLM call."""
+    match = state["near_duplicate"]
+    thread_id = config.get("configurable", {}).get("thread_id", "")
+    manifest = plan_manifest(config)
+    if manifest:
+        manifest.record(thread_id, source=state["current_file"], destination=match["destination"], confidence=match["similarity"],
+                        memory=memory_for(config, state["recipe"]).collection_name)
+        result = f"Planned move of {Path(state['current_file']).name} to {match['destination']}."
+    else:
+        result = await asyncio.to_thread(place_file, state["current_file"], match["destination"], thread_id, True,
+                                         storage_for(config), memory_for(config, state["recipe"]))
+    print(f"NEAR-DUPLICATE ({match['similarity']:.2f}): {result}")
+    return {"messages": [AIMessage(content=f"Near-duplicate of {match['sorted_path']}. {result}")]}
+
+async def quick_decision_node(state: AgentState, config: RunnableConfig):
+    """
+    Haiku decides first. Confident decisions that agree with memory are executed
+    directly (rename, then move); everything else escalates to the sorting agent.
+    """
+    decision = state.get("decision")
+    current = state["current_file"]
+    storage = storage_for(config)
+
+    if not decision:
+        folders = await asyncio.to_thread(storage.list_folders, storage.sorted_root) or []
+        rules_str = "\n".join(state["recipe"]["rules"])
+        prompt = (
+            "You are Sorterra, an expert file organization assistant. Decide where this file goes.\n\n"
+            f"### Existing folders in '{storage.sorted_root}':\n{', '.join(folders) or '(none)'}\n\n"
+            f"### Sorting Rules:\n{rules_str}\n\n"
+            f"### Current Analysis:\n{state['analysis_summary']}\n\n"
+            "Prefer existing folders. Rules win over memory hints. Report a calibrated confidence: "
+            "below 0.85 whenever the document type, project or vendor is ambiguous."
+        )
+        started = time.time()
+        output = await model_decision.ainvoke([HumanMessage(content=prompt)])
+        seconds = time.time() - started
+        tokens = _usage(state, output["raw"], "haiku")
+        decision = dict(output["parsed"] or {})
+
+        confident = (
+            decision.get("destination_folder")
+            and decision.get("confidence", 0) >= ROUTE_CONFIDENCE_THRESHOLD
+            and not decision.get("conflict")
+            and not conflicts_with_memory(decision["destination_folder"], state.get("memory_destinations") or [])
+        )
+        route = "quick" if confident else "escalated"
+        print(f"ROUTE: {route} ({decision.get('destination_folder')}, confidence {decision.get('confidence', 0):.2f})")
+        update = {"decision": decision, "decision_route": route, "decision_seconds": seconds, "decision_tokens": tokens}
+        if route == "escalated":
+            return update
+    else:
+        update = {}
 
-def sorting_agent(state: AgentState):
+    # One tool call per step: a rename and a move of the same file must not run in parallel
+    if decision.get("new_name") and not decision.get("renamed") and decision["new_name"] != Path(current).name:
+        decision = {**decision, "renamed": True}
+        call = _tool_call("rename_file", source_path=current, new_name=decision["new_name"])
+    else:
+        source = storage.sibling(current, decision["new_name"]) if decision.get("renamed") else current
+        decision = {**decision, "moved": True}
+        call = _tool_call("move_file", source_path=source, destination_folder=decision["destination_folder"],
+                          confidence=decision["confidence"])
+    print(f"ACTION: {call['name']}({', '.join([f'{k}={v}' for k, v in call['args'].items()])})")
+    return {**update, "decision": decision, "messages": [AIMessage(content="", tool_calls=[call])]}
+
+async def sorting_agent(state: AgentState, config: RunnableConfig):
     """Decides the move based on the analysis summary."""
     rules_str = "\n".join(state["recipe"]["rules"])
+    sorted_root = storage_for(config).sorted_root
     
     system_prompt_content = (
         "You are Sorterra, an expert file organization assistant.\n\n"
         "### Operational Workflow:\n"
-        "1. **Explore Context**: Use 'list_folders' on 'data/sorted_data' to see "
+        f"1. **Explore Context**: Use 'list_folders' on '{sorted_root}' to see "
         "what categories already exist. This helps avoid creating redundant folders.\n"
         "2. **Sanitize Filename**: If the filename is messy, use 'rename_file' first.\n"
         "3. **Apply Rules & Memory**: Use 'move_file' to categorize the file based "
@@ -59,7 +224,11 @@ def sorting_agent(state: AgentState):
     )
     
     system_prompt = SystemMessage(content=system_prompt_content)
-    response = model_thinking.invoke([system_prompt] + state['messages'])
+    started = time.time()
+    response = await model_thinking.ainvoke([system_prompt] + compact_history(state['messages']))
+    seconds = (state.get("decision_seconds") or 0.0) + time.time() - started
+    tokens = _usage(state, response, "sonnet")
+    route = "escalated" if state.get("decision_route") in ("escalated", "quick") else "thinking"
 
     # LOGGING: Only print if there's a specific tool action or a final conclusion
     if response.tool_calls:
@@ -71,8 +240,31 @@ def sorting_agent(state: AgentState):
     else:
         # Final reasoning summary
         print(f"REASONING: {response.content.strip()}")
+        routing_stats.record(route, seconds, tokens)
+
+    return {"messages": [response], "decision_route": route, "decision_seconds": seconds, "decision_tokens": tokens}
+
+def route_analysis(state: AgentState, config: RunnableConfig) -> Literal["near_duplicate", "quick_decision", "agent"]:
+    if state.get("near_duplicate"):
+        return "near_duplicate"
+    routing = config.get("configurable", {}).get("model_routing", MODEL_ROUTING)
+    return "quick_decision" if routing == "confidence" else "agent"
+
+def route_quick(state: AgentState) -> Literal["tools", "agent"]:
+    return "tools" if state.get("decision_route") == "quick" else "agent"
 
-    return {"messages": [response]}
+def route_after_tools(state: AgentState) -> Literal["quick_decision", "agent", "__end__"]:
+    """Quick decisions continue without Sonnet unless a tool call failed."""
+    if state.get("decision_route") != "quick":
+        return "agent"
+    result = str(state['messages'][-1].content)
+    if result.startswith(("Failed", "Error")):
+        return "agent"
+    if not state["decision"].get("moved"):
+        return "quick_decision"
+    # Counted only once the move has gone through; a failed one escalates to the agent
+    routing_stats.record("quick", state.get("decision_seconds") or 0.0, state.get("decision_tokens") or {})
+    return "__end__"
 
 def should_continue(state: AgentState) -> Literal["tools", "__end__"]:
     return "tools" if state['messages'][-1].tool_calls else "__end__"
@@ -80,12 +272,22 @@ def should_continue(state: AgentState) -> Literal["tools", "__end__"]:
 # Graph Construction
 workflow = StateGraph(AgentState)
 workflow.add_node("analyzer", analyzer_node)
+workflow.add_node("quick_decision", quick_decision_node)
 workflow.add_node("agent", sorting_agent)
 workflow.add_node("tools", ToolNode(TOOLS))
+workflow.add_node("near_duplicate", near_duplicate_node)
 
 workflow.set_entry_point("analyzer")
-workflow.add_edge("analyzer", "agent")
+workflow.add_conditional_edges("analyzer", route_analysis)
+workflow.add_edge("near_duplicate", END)
+workflow.add_conditional_edges("quick_decision", route_quick)
 workflow.add_conditional_edges("agent", should_continue)
-workflow.add_edge("tools", "agent")
+workflow.add_conditional_edges("tools", route_after_tools)
 
-app = workflow.compile()
\ No newline at end of file
+# Persistent checkpoints: each file runs on its own thread and resumes from its last completed node
+@asynccontextmanager
+async def open_app(db_path=CHECKPOINT_DB_PATH):
+    """Compiles the graph against the checkpoint database (tools are async: use ainvoke/astream)."""
+    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    async with AsyncSqliteSaver.from_conn_string(db_path) as checkpointer:
+        yield workflow.compile(checkpointer=checkpointer)
@@ -0,0 +1,82 @@
+import errno
+import os
+import shutil
+import time
+from collections import defaultdict
+from pathlib import Path
+from core.plan import DecisionManifest
+from core.tools import BASE_SORTED_DIR, journal, memory_for, names, record_placement
+
+def _atomic_move(source: Path, target: Path):
+    """rename(2) is atomic within a filesystem; fall back to copy+delete across mounts."""
+    if target.exists():
+        # rename(2) would silently replace it
+        raise FileExistsError(f"{target} already exists")
+    try:
+        os.rename(source, target)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(str(source), str(target))
+
+def apply_manifest(manifest_path: str, min_confidence: float = 0.0):
+    """
+    Executes a plan-mode manifest in bulk.
+
+    Decisions are grouped by destination so each folder is created once, and
+    target names come from the shared NameReservations counters.
+    Every move goes through the journal, so re-applying is a no-op.
+    """
+    groups = defaultdict(list)
+    stats = {"moved": 0, "skipped": 0, "failed": 0}
+    for decision in DecisionManifest(manifest_path).decisions():
+        if decision.get("confidence", 1.0) < min_confidence:
+            print(f"REVIEW: {decision['source']} (confidence {decision['confidence']:.2f})")
+            stats["skipped"] += 1
+            continue
+        groups[decision.get("destination")].append(decision)
+
+    start = time.time()
+    for destination, decisions in groups.items():
+        if destination:
+            dest_dir = BASE_SORTED_DIR / destination
+            dest_dir.mkdir(parents=True, exist_ok=True)
+
+        for decision in decisions:
+            source = Path(decision["source"])
+            op = "move" if destination else "rename"
+            entry = journal.find(decision["thread_id"], op, str(source))
+            if entry and entry["status"] == "done":
+                stats["skipped"] += 1
+                continue
+
+            name = decision.get("new_name") or source.name
+            if entry:
+                op_id, target = entry["id"], Path(entry["target"])
+            else:
+                # Rename-only decisions stay in their folder; reserve() skips names taken on disk
+                target = names.reserve(dest_dir if destination else source.parent, name)
+                op_id = journal.begin(decision["thread_id"], op, str(source), str(target.resolve()))
+                try:
+                    _atomic_move(source, target)
+                except Exception as e:
+                    journal.mark(op_id, "failed", str(e))
+                    names.release(target)
+                    print(f"FAILED: {source} -> {target}: {e}")
+                    stats["failed"] += 1
+                    continue
+                journal.mark(op_id, "applied")
+
+            if destination:
+                # Learned into the memory partition of the recipe that made the decision;
+                # exact duplicates are recorded with learn=False and only indexed
+                memory = memory_for({"configurable": {"memory": decision.get("memory")}})
+                record_placement(str(target), destination, learn=decision.get("learn", True), vector_memory=memory)
+            journal.mark(op_id, "done", f"Moved {source.name} to {target}.")
+            stats["moved"] += 1
+
+        print(f"{destination or '(rename only)'}: {len(decisions)} decision(s)")
+
+    elapsed = time.time() - start
+    print(f"APPLIED: {stats['moved']} moved, {stats['skipped']} skipped, {stats['failed']} failed in {elapsed:.1f}s")
+    return stats
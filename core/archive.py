@@ -0,0 +1,101 @@
+import io
+import os
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+# Budgets for one archive, across all nesting levels
+ARCHIVE_MAX_MEMBERS = 200
+ARCHIVE_MAX_BYTES = 4 * 1024 * 1024      # decompressed bytes actually read
+ARCHIVE_MAX_DEPTH = 2                    # nested zip/document levels
+ARCHIVE_TIME_BUDGET = 5.0                # seconds
+MEMBER_PREFIX_BYTES = 2048               # read from each text-like member
+MEMBER_PREVIEW_CHARS = 240               # shown per member, so one listing covers many members
+NESTED_DOCUMENT_MAX_BYTES = 1024 * 1024  # larger nested documents are listed, not extracted
+
+TEXT_MEMBER_EXTENSIONS = {'txt', 'md', 'csv', 'json', 'yaml', 'yml', 'ini', 'log', 'xml', 'html', 'htm', 'svg', 'rtf'}
+DOCUMENT_MEMBER_EXTENSIONS = {'pdf', 'docx', 'pptx', 'xlsx', 'sqlite', 'parquet', 'png', 'jpg', 'jpeg', 'bmp', 'gif', 'wav'}
+
+class ArchiveBudget:
+    """Shared member/byte/time allowance for one inspection."""
+    def __init__(self, max_members=ARCHIVE_MAX_MEMBERS, max_bytes=ARCHIVE_MAX_BYTES, seconds=ARCHIVE_TIME_BUDGET):
+        self.members = max_members
+        self.bytes = max_bytes
+        self.deadline = time.monotonic() + seconds
+
+    def exhausted(self):
+        return self.members <= 0 or self.bytes <= 0 or time.monotonic() > self.deadline
+
+    def read(self, member, limit):
+        """Reads at most limit bytes (and what the budget allows) from an open member stream."""
+        data = member.read(max(0, min(limit, self.bytes)))
+        self.bytes -= len(data)
+        return data
+
+def _decode(data: bytes):
+    for encoding in ('utf-8', 'utf-16'):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode('latin-1')
+
+def inspect_archive(path, extract, max_chars: int, budget: ArchiveBudget = None):
+    """
+    Describes a ZIP archive without extracting it: member headers from the
+    central directory, a bounded prefix of every text-like member (decompressed
+    in memory), nested archives recursively and small nested documents through
+    `extract(path)`, the regular extractor. Stops at the budget.
+    """
+    budget = budget or ArchiveBudget()
+    lines = []
+    with zipfile.ZipFile(path) as archive:
+        _walk(archive, 0, budget, lines, extract)
+    text = "\n".join(lines)
+    return text if len(text) <= max_chars else text[:max_chars] + "\n[... listing truncated ...]"
+
+def _walk(archive, depth, budget, lines, extract):
+    indent = "  " * depth
+    members = [info for info in archive.infolist() if not info.is_dir()]
+    total = sum(info.file_size for info in members)
+    lines.append(f"{indent}[ZIP Contents]: {len(members)} files, {total} bytes uncompressed")
+
+    for index, info in enumerate(members):
+        if budget.exhausted():
+            lines.append(f"{indent}[... {len(members) - index} more members not inspected (budget) ...]")
+            return
+        budget.members -= 1
+        lines.append(f"{indent}- {info.filename} ({info.file_size} bytes)")
+
+        ext = Path(info.filename).suffix.lower().strip('.')
+        if info.flag_bits & 0x1:
+            lines.append(f"{indent}  (encrypted)")
+            continue
+        try:
+            if ext in TEXT_MEMBER_EXTENSIONS:
+                with archive.open(info) as member:
+                    prefix = _decode(budget.read(member, MEMBER_PREFIX_BYTES))
+                lines.append(f"{indent}  > " + " ".join(prefix.split())[:MEMBER_PREVIEW_CHARS])
+
+            elif depth < ARCHIVE_MAX_DEPTH and ext == 'zip' and info.file_size <= budget.bytes:
+                with archive.open(info) as member:
+                    data = budget.read(member, info.file_size)
+                with zipfile.ZipFile(io.BytesIO(data)) as nested:
+                    _walk(nested, depth + 1, budget, lines, extract)
+
+            elif (depth < ARCHIVE_MAX_DEPTH and ext in DOCUMENT_MEMBER_EXTENSIONS
+                    and info.file_size <= min(NESTED_DOCUMENT_MAX_BYTES, budget.bytes)):
+                # The extractors work on paths: spool this one member to a temp file
+                with archive.open(info) as member:
+                    data = budget.read(member, info.file_size)
+                fd, tmp_path = tempfile.mkstemp(suffix=f".{ext}")
+                try:
+                    with os.fdopen(fd, 'wb') as f:
+                        f.write(data)
+                    content = extract(tmp_path)
+                finally:
+                    os.unlink(tmp_path)
+                lines.append(f"{indent}  > " + " ".join(content.split())[:MEMBER_PREVIEW_CHARS])
+        except (zipfile.BadZipFile, RuntimeError, OSError, EOFError) as e:
+            lines.append(f"{indent}  (unreadable: {e})")
@@ -0,0 +1,103 @@
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from core.memory import DEFAULT_COLLECTION
+from core.ocr import has_ocr_text
+from core.policy import analysis_policy
+from core.tools import extract_content, hash_index, memory_for, near_index
+
+BOOTSTRAP_DB_PATH = "./data/sorterra_bootstrap.sqlite"
+BOOTSTRAP_WORKERS = 8        # parallel extractions
+BOOTSTRAP_BATCH_SIZE = 256   # files per embedding/write batch
+
+class BootstrapProgress:
+    """Files already ingested per collection, so an interrupted bootstrap resumes where it stopped."""
+    def __init__(self, db_path=BOOTSTRAP_DB_PATH):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS ingested ("
+            "collection TEXT NOT NULL, path TEXT NOT NULL, size INTEGER NOT NULL, mtime REAL NOT NULL, "
+            "PRIMARY KEY (collection, path))"
+        )
+        self.conn.commit()
+
+    def done(self, collection: str):
+        """{path: (size, mtime)} of the files ingested into collection."""
+        rows = self.conn.execute("SELECT path, size, mtime FROM ingested WHERE collection = ?", (collection,))
+        return {path: (size, mtime) for path, size, mtime in rows}
+
+    def mark(self, collection: str, files):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO ingested VALUES (?, ?, ?, ?)",
+            [(collection, str(path), stat.st_size, stat.st_mtime) for path, stat in files],
+        )
+        self.conn.commit()
+
+def _extract(path: Path):
+    """(content, learn) for one sorted file, extracted the way record_placement would."""
+    policy = analysis_policy(path)
+    content = extract_content(str(path), policy["depth"])
+    return content, policy["memory"] or has_ocr_text(content)
+
+def bootstrap_memory(sorted_root, collection: str = DEFAULT_COLLECTION, workers: int = BOOTSTRAP_WORKERS,
+                     batch_size: int = BOOTSTRAP_BATCH_SIZE):
+    """
+    Teaches vector memory from an existing, hand-sorted tree: every file is
+    learned as if it had been placed in its current folder.
+
+    Files are extracted in parallel and learned batch_size at a time (one
+    embedding call and one write per batch). Finished batches are recorded,
+    and files whose size and mtime are unchanged are skipped on the next run.
+    """
+    sorted_root = Path(sorted_root)
+    progress = BootstrapProgress()
+    done = progress.done(collection)
+    vector_memory = memory_for({"configurable": {"memory": collection}})
+
+    pending = []
+    for path in sorted(p for p in sorted_root.rglob('*') if p.is_file()):
+        if path.parent == sorted_root:
+            continue  # Loose files at the root have no destination to learn
+        stat = path.stat()
+        if done.get(str(path)) == (stat.st_size, stat.st_mtime):
+            continue
+        pending.append((path, stat))
+    print(f"BOOTSTRAP: {len(pending)} file(s) to ingest from {sorted_root} into '{collection}' "
+          f"({len(done)} already done)")
+
+    stats = {"learned": 0, "skipped": 0, "failed": 0}
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for offset in range(0, len(pending), batch_size):
+            batch = pending[offset:offset + batch_size]
+            placements, finished = [], []
+            for (path, stat), (content, learn) in zip(batch, pool.map(lambda item: _extract(item[0]), batch)):
+                if content.startswith("Error"):
+                    # Not marked as done: retried on the next run
+                    print(f"BOOTSTRAP: {content}")
+                    stats["failed"] += 1
+                    continue
+                finished.append((path, stat))
+                if not learn or "Error" in content:
+                    stats["skipped"] += 1
+                    continue
+                destination = path.parent.relative_to(sorted_root).as_posix()
+                placements.append((content, destination))
+                near_index.add(content, destination, str(path), collection)
+                hash_index.record(str(path), destination)
+
+            if placements:
+                vector_memory.learn_batch(placements)
+            progress.mark(collection, finished)
+            stats["learned"] += len(placements)
+
+            processed = offset + len(batch)
+            elapsed = max(time.time() - start, 1e-6)
+            print(f"BOOTSTRAP: {processed}/{len(pending)} files, {processed / elapsed:.1f} files/s")
+
+    elapsed = time.time() - start
+    print(f"BOOTSTRAP: learned {stats['learned']}, skipped {stats['skipped']}, failed {stats['failed']} "
+          f"in {elapsed:.1f}s")
+    return stats
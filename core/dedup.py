@@ -0,0 +1,186 @@
+import hashlib
+import re
+import sqlite3
+import threading
+from pathlib import Path
+import numpy as np
+
+HASH_DB_PATH = "./data/sorterra_hashes.sqlite"
+HASH_CHUNK_SIZE = 1024 * 1024
+DEFAULT_PARTITION = "langchain"   # core.memory.DEFAULT_COLLECTION
+
+# MinHash-LSH settings: 16 bands x 8 rows puts the LSH threshold near 0.7 Jaccard
+MINHASH_PERMUTATIONS = 128
+LSH_BANDS = 16
+SHINGLE_SIZE = 5
+_PRIME = (1 << 31) - 1
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, _PRIME, size=MINHASH_PERMUTATIONS).astype(np.uint64)
+_PERM_B = _rng.randint(0, _PRIME, size=MINHASH_PERMUTATIONS).astype(np.uint64)
+
+def file_digest(file_path: str):
+    """Streams the file through BLAKE2b in fixed-size chunks (constant memory)."""
+    digest = hashlib.blake2b(digest_size=32)
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ContentHashIndex:
+    """
+    Exact-duplicate index of every file Sorterra has sorted.
+
+    Sorted files are recorded by size only; their digest is computed lazily the
+    first time another file of the same size shows up. Files with a unique size
+    are therefore never hashed, on either side of the comparison.
+    """
+    def __init__(self, db_path=HASH_DB_PATH):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS sorted_files ("
+            "sorted_path TEXT PRIMARY KEY, size INTEGER NOT NULL, digest TEXT, destination TEXT NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_sorted_size ON sorted_files (size)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_sorted_digest ON sorted_files (digest)")
+        self.conn.commit()
+
+    def record(self, sorted_path: str, destination: str):
+        """Registers a file that now lives at sorted_path under destination."""
+        size = Path(sorted_path).stat().st_size
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sorted_files (sorted_path, size, digest, destination) VALUES (?, ?, NULL, ?)",
+                (str(sorted_path), size, destination),
+            )
+            self.conn.commit()
+
+    def lookup(self, file_path: str):
+        """
+        Returns {'destination', 'sorted_path', 'digest'} for a previously sorted
+        file with identical content, or None.
+        """
+        size = Path(file_path).stat().st_size
+        with self._lock:
+            candidates = self.conn.execute(
+                "SELECT sorted_path, digest, destination FROM sorted_files WHERE size = ?", (size,)
+            ).fetchall()
+        if not candidates:
+            return None
+
+        digest = file_digest(file_path)
+        for row in candidates:
+            candidate_digest = row["digest"] or self._fill_digest(row["sorted_path"])
+            if candidate_digest == digest:
+                return {"destination": row["destination"], "sorted_path": row["sorted_path"], "digest": digest}
+        return None
+
+    def _fill_digest(self, sorted_path):
+        """Hashes a sorted file on demand; drops the row if the file is gone."""
+        if not Path(sorted_path).exists():
+            with self._lock:
+                self.conn.execute("DELETE FROM sorted_files WHERE sorted_path = ?", (sorted_path,))
+                self.conn.commit()
+            return None
+        digest = file_digest(sorted_path)
+        with self._lock:
+            self.conn.execute("UPDATE sorted_files SET digest = ? WHERE sorted_path = ?", (digest, sorted_path))
+            self.conn.commit()
+        return digest
+
+
+def minhash_signature(text: str):
+    """MinHash signature over word 5-shingles of extracted text (None if empty)."""
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return None
+    span = min(SHINGLE_SIZE, len(words))
+    shingles = {" ".join(words[i:i + span]) for i in range(len(words) - span + 1)}
+
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode(), digest_size=4).digest(), 'little') for s in shingles),
+        dtype=np.uint64,
+        count=len(shingles),
+    ) % np.uint64(_PRIME)
+    # (a * x + b) mod p for every shingle/permutation pair; products stay below 2^62
+    return ((np.outer(hashes, _PERM_A) + _PERM_B) % np.uint64(_PRIME)).min(axis=0)
+
+class NearDuplicateIndex:
+    """
+    MinHash-LSH index over the read_file_content output of sorted files.
+
+    Signatures are persisted in SQLite and bucketed in memory by LSH band, so a
+    query only compares against files sharing at least one band - typically a
+    handful of candidates, well under a millisecond. Like vector memory, the
+    index is partitioned per memory collection: a near-copy sorted under one
+    recipe never routes a file under another.
+    """
+    def __init__(self, db_path=HASH_DB_PATH):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS near_signatures ("
+            "sorted_path TEXT PRIMARY KEY, destination TEXT NOT NULL, signature BLOB NOT NULL, "
+            f"partition TEXT NOT NULL DEFAULT '{DEFAULT_PARTITION}')"
+        )
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(near_signatures)")]
+        if "partition" not in columns:
+            # Signatures recorded before partitioning were learned into the default collection
+            self.conn.execute(
+                f"ALTER TABLE near_signatures ADD COLUMN partition TEXT NOT NULL DEFAULT '{DEFAULT_PARTITION}'"
+            )
+        self.conn.commit()
+
+        self.entries = {}
+        self.buckets = [{} for _ in range(LSH_BANDS)]
+        rows = self.conn.execute("SELECT sorted_path, destination, signature, partition FROM near_signatures")
+        for path, destination, blob, partition in rows:
+            self._insert(path, destination, np.frombuffer(blob, dtype=np.uint64), partition)
+
+    def add(self, content: str, destination: str, sorted_path: str, partition: str = DEFAULT_PARTITION):
+        signature = minhash_signature(content)
+        if signature is None:
+            return
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO near_signatures (sorted_path, destination, signature, partition) "
+                "VALUES (?, ?, ?, ?)",
+                (str(sorted_path), destination, signature.tobytes(), partition),
+            )
+            self.conn.commit()
+            self._insert(str(sorted_path), destination, signature, partition)
+
+    def query(self, content: str, partition: str = DEFAULT_PARTITION):
+        """
+        Returns {'destination', 'sorted_path', 'similarity'} for the closest
+        near-copy previously sorted into partition, or None if no LSH bucket matches.
+        """
+        signature = minhash_signature(content)
+        if signature is None:
+            return None
+        with self._lock:
+            candidates = set()
+            for band, key in enumerate(self._band_keys(signature)):
+                candidates.update(self.buckets[band].get((partition, key), ()))
+            scored = [(float(np.mean(self.entries[c][1] == signature)), c) for c in candidates]
+        if not scored:
+            return None
+        similarity, path = max(scored)
+        return {"destination": self.entries[path][0], "sorted_path": path, "similarity": similarity}
+
+    def _insert(self, path, destination, signature, partition):
+        if path in self.entries:
+            _, old_signature, old_partition = self.entries[path]
+            for band, key in enumerate(self._band_keys(old_signature)):
+                self.buckets[band].get((old_partition, key), set()).discard(path)
+        self.entries[path] = (destination, signature, partition)
+        for band, key in enumerate(self._band_keys(signature)):
+            self.buckets[band].setdefault((partition, key), set()).add(path)
+
+    @staticmethod
+    def _band_keys(signature):
+        rows = MINHASH_PERMUTATIONS // LSH_BANDS
+        return [signature[i * rows:(i + 1) * rows].tobytes() for i in range(LSH_BANDS)]
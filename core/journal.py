@@ -0,0 +1,101 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+JOURNAL_DB_PATH = "./data/sorterra_journal.sqlite"
+
+def thread_id_for(file_path: str):
+    """Stable checkpoint thread ID for an input file (path + size + mtime)."""
+    path = Path(file_path)
+    stat = path.stat()
+    return f"{path.resolve()}@{stat.st_size}-{stat.st_mtime_ns}"
+
+class MoveJournal:
+    """
+    Write-ahead log for the filesystem side effects of the agent tools.
+
+    Each move/rename is written as 'pending' before the disk is touched, marked
+    'applied' once the file is in place and 'done' once follow-up work (memory
+    learning) has finished. A restarted run replays the same tool calls, so the
+    tools consult the journal first and never move a file or learn a move twice.
+    """
+    def __init__(self, db_path=JOURNAL_DB_PATH):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS operations ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, thread_id TEXT NOT NULL, op TEXT NOT NULL, "
+            "source TEXT NOT NULL, target TEXT NOT NULL, status TEXT NOT NULL, "
+            "result TEXT, updated_at REAL NOT NULL)"
+        )
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(operations)")}
+        if "backend" not in columns:
+            # Which storage backend the paths belong to; journals from before SharePoint are all local
+            self.conn.execute("ALTER TABLE operations ADD COLUMN backend TEXT NOT NULL DEFAULT 'local'")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_operations_key ON operations (thread_id, op, source)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_operations_target ON operations (target)")
+        self.conn.commit()
+        self.recover()
+
+    def recover(self, backend: str = "local", exists=None):
+        """
+        Reconciles entries of one storage backend left 'pending' by a crash.
+        exists(path) checks the backend (default: the local filesystem); remote
+        backends are recovered once their storage is connected.
+        """
+        exists = exists or (lambda path: Path(path).exists())
+        with self._lock:
+            pending = self.conn.execute(
+                "SELECT id, source, target FROM operations WHERE status = 'pending' AND backend = ?", (backend,)
+            ).fetchall()
+        for row in pending:
+            landed = exists(row["target"]) and not exists(row["source"])
+            self.mark(row["id"], "applied" if landed else "failed")
+
+    def find(self, thread_id: str, op: str, source: str):
+        """Returns the latest applied/done entry for this operation, if any."""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT * FROM operations WHERE thread_id = ? AND op = ? AND source = ? "
+                "AND status IN ('applied', 'done') ORDER BY id DESC LIMIT 1",
+                (thread_id, op, source),
+            ).fetchone()
+        return dict(row) if row else None
+
+    def begin(self, thread_id: str, op: str, source: str, target: str, backend: str = "local"):
+        with self._lock:
+            cursor = self.conn.execute(
+                "INSERT INTO operations (thread_id, op, source, target, status, updated_at, backend) "
+                "VALUES (?, ?, ?, ?, 'pending', ?, ?)",
+                (thread_id, op, source, target, time.time(), backend),
+            )
+            self.conn.commit()
+        return cursor.lastrowid
+
+    def mark(self, op_id: int, status: str, result: str = None):
+        with self._lock:
+            self._set_status(op_id, status, result)
+            self.conn.commit()
+
+    def thread_for(self, file_path: str):
+        """
+        Maps a renamed file back to the thread that renamed it. file_path must be
+        in the form rename targets are recorded in (StorageBackend.key).
+        """
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT thread_id FROM operations WHERE op = 'rename' AND target = ? "
+                "AND status IN ('applied', 'done') ORDER BY id DESC LIMIT 1",
+                (file_path,),
+            ).fetchone()
+        return row["thread_id"] if row else None
+
+    def _set_status(self, op_id, status, result=None):
+        self.conn.execute(
+            "UPDATE operations SET status = ?, result = COALESCE(?, result), updated_at = ? WHERE id = ?",
+            (status, result, time.time(), op_id),
+        )
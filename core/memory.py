@@ -0,0 +1,142 @@
+import hashlib
+import re
+import threading
+import time
+from functools import lru_cache
+from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_chroma import Chroma
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+VECTOR_DB_PATH = "./data/sorterra_memory"
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_COLLECTION = "langchain"
+# Everything learned before memory was partitioned was learned under this recipe (main.DEFAULT_RECIPE)
+# into DEFAULT_COLLECTION; it keeps that collection so nothing has to be re-learned
+LEGACY_RECIPE_NAME = "ACME Corp Enterprise Sort"
+MATCH_MAX_DISTANCE = 0.6
+MEMORY_MAX_CHUNKS_PER_DESTINATION = 2000   # compaction keeps the most recent chunks per destination
+COMPACT_DELETE_BATCH = 5000
+COLLECTION_NAME_MAX = 63                   # Chroma's limit
+
+def memory_partition(recipe_name: str = None, tenant: str = None):
+    """
+    Chroma collection for a recipe (and optional tenant), so hints learned under
+    one taxonomy never show up under another. No recipe, or the pre-partitioning
+    recipe without a tenant: the default collection.
+    """
+    if not recipe_name or (recipe_name == LEGACY_RECIPE_NAME and not tenant):
+        return DEFAULT_COLLECTION
+    slug = lambda text: re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-') or "x"
+    name = f"recipe-{slug(recipe_name)}"
+    if tenant:
+        name = f"{slug(tenant)}.{name}"
+    if len(name) > COLLECTION_NAME_MAX:
+        digest = hashlib.sha1(name.encode()).hexdigest()[:8]
+        name = f"{name[:COLLECTION_NAME_MAX - 9].rstrip('-.')}-{digest}"
+    return name
+
+def list_partitions():
+    """Names of the memory collections on disk."""
+    import chromadb
+    collections = chromadb.PersistentClient(path=VECTOR_DB_PATH).list_collections()
+    # Older chromadb returns Collection objects, newer ones plain names
+    return sorted(getattr(c, "name", c) for c in collections)
+
+@lru_cache(maxsize=None)
+def embedding_model():
+    """Loaded on first use, so processes that talk to the memory service never load it."""
+    return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+
+class SorterraMemory:
+    def __init__(self, collection_name=DEFAULT_COLLECTION):
+        self.collection_name = collection_name
+        self._lock = threading.Lock()
+        self.searches = 0
+        self.hits = 0
+        self.db = Chroma(collection_name=collection_name, persist_directory=VECTOR_DB_PATH, embedding_function=embedding_model(), collection_metadata={"hnsw:space": "cosine"})
+
+    def get_similar_mapping(self, content: str):
+        try:
+            return self.describe(self.similar_destinations(content))
+        except Exception as e:
+            return f"Memory access error: {str(e)}"
+
+    def similar_destinations(self, content: str):
+        """(destination, cosine distance) of the confident matches for content."""
+        return self.similar_batch([content])[0]
+
+    def similar_batch(self, contents):
+        """similar_destinations for several contents, embedded in one model call."""
+        results = self._search(contents)
+        with self._lock:
+            self.searches += len(results)
+            self.hits += sum(1 for matches in results if matches)
+        return results
+
+    def _search(self, contents):
+        vectors = embedding_model().embed_documents(contents)
+        results = [self.db.similarity_search_by_vector_with_relevance_scores(vector, k=5) for vector in vectors]
+
+        # With cosine distance, 0 is a perfect match and higher numbers are further away.
+        # Adjusted threshold: only keep matches with distance < 0.6
+        return [[(d.metadata.get('destination'), s) for d, s in matches if s < MATCH_MAX_DISTANCE] for matches in results]
+
+    @staticmethod
+    def describe(matches):
+        if not matches:
+            return "No high-confidence matches in memory."
+        return "\n".join([f"Previously sorted to '{destination}' (Dist: {s:.2f})" for destination, s in matches])
+
+    def learn_new_move(self, content: str, destination: str):
+        self.learn_batch([(content, destination)])
+
+    def learn_batch(self, placements):
+        """Learns several (content, destination) pairs with one embedding call and one write."""
+        # Split text into manageable pieces
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=1000,
+            chunk_overlap=100
+        )
+        texts, metadatas = [], []
+        for content, destination in placements:
+            chunks = text_splitter.split_text(content)
+            texts.extend(chunks)
+            # Store each chunk with the same destination metadata
+            metadatas.extend({"destination": destination, "learned_at": time.time()} for _ in chunks)
+        if texts:
+            self.db.add_texts(texts=texts, metadatas=metadatas)
+
+    def stats(self):
+        """Size of this partition, plus how often this process's searches found a confident match."""
+        metadatas = self.db.get(include=["metadatas"])["metadatas"]
+        destinations = {(m or {}).get("destination") for m in metadatas}
+        return {
+            "collection": self.collection_name,
+            "chunks": len(metadatas),
+            "destinations": len(destinations),
+            "searches": self.searches,
+            "hit_rate": round(self.hits / self.searches, 3) if self.searches else None,
+        }
+
+    def compact(self, max_per_destination: int = MEMORY_MAX_CHUNKS_PER_DESTINATION):
+        """
+        Shrinks this partition: drops chunks learned more than once for the same
+        destination, then the oldest chunks of destinations above max_per_destination.
+        Returns the number of chunks removed.
+        """
+        data = self.db.get(include=["metadatas", "documents"])
+        by_destination, seen, remove = {}, set(), []
+        # Newest first, so duplicates and overflow are removed from the old end
+        entries = sorted(zip(data["ids"], [m or {} for m in data["metadatas"]], data["documents"]),
+                         key=lambda e: e[1].get("learned_at", 0), reverse=True)
+        for chunk_id, metadata, document in entries:
+            destination = metadata.get("destination")
+            kept = by_destination.setdefault(destination, [])
+            if (destination, document) in seen or len(kept) >= max_per_destination:
+                remove.append(chunk_id)
+                continue
+            seen.add((destination, document))
+            kept.append(chunk_id)
+        for start in range(0, len(remove), COMPACT_DELETE_BATCH):
+            self.db.delete(ids=remove[start:start + COMPACT_DELETE_BATCH])
+        return len(remove)
@@ -0,0 +1,180 @@
+"""
+Local memory service: one process owns the embedding model and the Chroma
+store and serves every sorting worker over a Unix socket.
+
+    python -m core.memory_service [--socket PATH]
+
+Workers opt in with SORTERRA_MEMORY_SOCKET=PATH; core.tools then hands out
+RemoteMemory clients instead of loading the model itself. Requests that
+arrive within MEMORY_BATCH_WINDOW of each other are grouped per collection
+and answered with one embedding call, and batches run one at a time so
+Chroma only ever sees a single writer.
+
+Protocol: one JSON object per line in each direction.
+    {"op": "similar", "collection": "...", "contents": ["..."]}
+    {"op": "learn", "collection": "...", "placements": [["content", "destination"]]}
+    {"op": "stats" | "compact", "collection": "..."}
+    -> {"ok": true, "result": ...} or {"ok": false, "error": "..."}
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import threading
+from pathlib import Path
+from core.memory import SorterraMemory, DEFAULT_COLLECTION
+
+MEMORY_SOCKET_PATH = "./data/sorterra_memory.sock"
+MEMORY_SERVICE_SOCKET = os.getenv("SORTERRA_MEMORY_SOCKET")  # set in workers to use the service
+MEMORY_BATCH_WINDOW = 0.01   # seconds to wait for more requests once one has arrived
+MEMORY_BATCH_MAX = 64        # requests per batch
+MEMORY_CLIENT_TIMEOUT = 60   # seconds
+
+class MemoryServer:
+    def __init__(self, socket_path=MEMORY_SOCKET_PATH):
+        self.socket_path = socket_path
+        self.memories = {}
+        self.queue = None
+        self.requests = 0
+        self.batches = 0
+
+    def memory(self, name):
+        if name not in self.memories:
+            self.memories[name] = SorterraMemory(name)
+        return self.memories[name]
+
+    async def serve(self):
+        self.queue = asyncio.Queue()
+        path = Path(self.socket_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.unlink(missing_ok=True)
+        server = await asyncio.start_unix_server(self._handle, path=str(path))
+        batcher = asyncio.create_task(self._batch_loop())
+        print(f"Memory service listening on {path}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            path.unlink(missing_ok=True)
+            print(f"Memory service: {self.requests} requests in {self.batches} batches")
+
+    async def _handle(self, reader, writer):
+        try:
+            while line := await reader.readline():
+                future = asyncio.get_running_loop().create_future()
+                await self.queue.put((json.loads(line), future))
+                try:
+                    response = {"ok": True, "result": await future}
+                except Exception as e:
+                    response = {"ok": False, "error": str(e)}
+                writer.write((json.dumps(response) + "\n").encode())
+                await writer.drain()
+        except (ConnectionError, json.JSONDecodeError):
+            pass
+        finally:
+            writer.close()
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + MEMORY_BATCH_WINDOW
+            while len(batch) < MEMORY_BATCH_MAX and (remaining := deadline - loop.time()) > 0:
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            outcomes = await asyncio.to_thread(self._run_batch, [request for request, _ in batch])
+            for (_, future), (result, error) in zip(batch, outcomes):
+                if future.done():
+                    continue  # Client went away
+                if error:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+            self.requests += len(batch)
+            self.batches += 1
+
+    def _run_batch(self, requests):
+        """(result, exception) per request. Same-collection requests of one kind share a model call."""
+        outcomes = [(None, None)] * len(requests)
+        groups = {}
+        for index, request in enumerate(requests):
+            key = (request.get("op"), request.get("collection", DEFAULT_COLLECTION))
+            groups.setdefault(key, []).append(index)
+
+        for (op, collection), indexes in groups.items():
+            try:
+                if op not in ("similar", "learn", "stats", "compact"):
+                    raise ValueError(f"Unknown memory operation: {op}")
+                memory = self.memory(collection)
+                if op in ("stats", "compact"):
+                    result = getattr(memory, op)()
+                    for i in indexes:
+                        outcomes[i] = (result, None)
+                elif op == "similar":
+                    contents = [c for i in indexes for c in requests[i]["contents"]]
+                    matches = iter(memory.similar_batch(contents))
+                    for i in indexes:
+                        outcomes[i] = ([next(matches) for _ in requests[i]["contents"]], None)
+                elif op == "learn":
+                    memory.learn_batch([tuple(p) for i in indexes for p in requests[i]["placements"]])
+                    for i in indexes:
+                        outcomes[i] = (len(requests[i]["placements"]), None)
+            except Exception as e:
+                for i in indexes:
+                    outcomes[i] = (None, e)
+        return outcomes
+
+class RemoteMemory(SorterraMemory):
+    """SorterraMemory whose model and store live in the memory service."""
+    def __init__(self, collection_name=DEFAULT_COLLECTION, socket_path=MEMORY_SOCKET_PATH):
+        self.collection_name = collection_name
+        self.socket_path = socket_path
+        self._lock = threading.Lock()
+        self.searches = 0
+        self.hits = 0
+
+    def _call(self, op, **params):
+        request = {"op": op, "collection": self.collection_name, **params}
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.settimeout(MEMORY_CLIENT_TIMEOUT)
+            conn.connect(self.socket_path)
+            conn.sendall((json.dumps(request) + "\n").encode())
+            reply = conn.makefile("rb").readline()
+        if not reply:
+            raise ConnectionError(f"Memory service at {self.socket_path} closed the connection")
+        response = json.loads(reply)
+        if not response["ok"]:
+            raise RuntimeError(response["error"])
+        return response["result"]
+
+    def _search(self, contents):
+        return [[tuple(match) for match in matches] for matches in self._call("similar", contents=list(contents))]
+
+    def learn_batch(self, placements):
+        self._call("learn", placements=[list(p) for p in placements])
+
+    def stats(self):
+        """The service's view of this partition, covering every worker's searches."""
+        return self._call("stats")
+
+    def compact(self):
+        return self._call("compact")
+
+def open_memory(collection_name=DEFAULT_COLLECTION):
+    """A memory for collection_name: served remotely when SORTERRA_MEMORY_SOCKET is set, else in-process."""
+    if MEMORY_SERVICE_SOCKET:
+        return RemoteMemory(collection_name, MEMORY_SERVICE_SOCKET)
+    return SorterraMemory(collection_name)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sorterra shared memory service")
+    parser.add_argument("--socket", default=MEMORY_SERVICE_SOCKET or MEMORY_SOCKET_PATH)
+    args = parser.parse_args()
+    try:
+        asyncio.run(MemoryServer(args.socket).serve())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,110 @@
+import re
+import sqlite3
+import threading
+from pathlib import Path
+
+NAMES_DB_PATH = "./data/sorterra_names.sqlite"
+
+class NameReservations:
+    """
+    Hands out collision-free target names per destination directory.
+
+    For every (directory, file name) pair a counter holds the next suffix to
+    try, so 'invoice.pdf' -> 'invoice_1.pdf' -> 'invoice_2.pdf' usually costs
+    one indexed lookup. The counter is seeded from a single directory scan the
+    first time a name collides. Every path handed out is also claimed in a
+    table keyed by (directory, filename): a candidate that was already claimed
+    under another base name (reserving 'inv_1.pdf' after 'inv.pdf' twice) or
+    that exists on disk is skipped. Reservations run inside a BEGIN IMMEDIATE
+    transaction, which makes them atomic across threads and across worker
+    processes sharing the database. A reservation whose move failed is
+    released, which frees the name and rewinds its counter.
+    """
+    def __init__(self, db_path=NAMES_DB_PATH):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS reservations ("
+            "directory TEXT NOT NULL, name TEXT NOT NULL, next_suffix INTEGER NOT NULL, "
+            "PRIMARY KEY (directory, name))"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS claimed ("
+            "directory TEXT NOT NULL, filename TEXT NOT NULL, name TEXT, suffix INTEGER, "
+            "PRIMARY KEY (directory, filename))"
+        )
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(claimed)")]
+        if "name" not in columns:
+            # Which counter handed the name out, so release() can rewind it
+            self.conn.execute("ALTER TABLE claimed ADD COLUMN name TEXT")
+            self.conn.execute("ALTER TABLE claimed ADD COLUMN suffix INTEGER")
+
+    def reserve(self, directory, name: str):
+        """Atomically claims a unique path for name inside directory."""
+        directory = Path(directory)
+        key = str(directory.resolve())
+        stem, suffix = Path(name).stem, Path(name).suffix
+
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute(
+                    "SELECT next_suffix FROM reservations WHERE directory = ? AND name = ?", (key, name)
+                ).fetchone()
+                next_suffix = row[0] if row else self._seed(directory, stem, suffix)
+                while True:
+                    # e.g., 'grocery_list.txt' -> 'grocery_list_1.txt'
+                    candidate = name if next_suffix == 0 else f"{stem}_{next_suffix}{suffix}"
+                    next_suffix += 1
+                    if (directory / candidate).exists():
+                        continue  # Placed outside Sorterra
+                    try:
+                        self.conn.execute(
+                            "INSERT INTO claimed (directory, filename, name, suffix) VALUES (?, ?, ?, ?)",
+                            (key, candidate, name, next_suffix - 1),
+                        )
+                        break
+                    except sqlite3.IntegrityError:
+                        continue  # Already handed out, possibly under another base name
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO reservations (directory, name, next_suffix) VALUES (?, ?, ?)",
+                    (key, name, next_suffix),
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+        return directory / candidate
+
+    def release(self, path):
+        """Gives back a reserved path whose move failed, so the next reservation can use it again."""
+        path = Path(path)
+        key = str(path.parent.resolve())
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute(
+                    "SELECT name, suffix FROM claimed WHERE directory = ? AND filename = ?", (key, path.name)
+                ).fetchone()
+                self.conn.execute("DELETE FROM claimed WHERE directory = ? AND filename = ?", (key, path.name))
+                if row and row[0] is not None:
+                    self.conn.execute(
+                        "UPDATE reservations SET next_suffix = MIN(next_suffix, ?) WHERE directory = ? AND name = ?",
+                        (row[1], key, row[0]),
+                    )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _seed(directory, stem, suffix):
+        """First reservation for a name: one stat, plus one scan only if it already collides."""
+        if not (directory / f"{stem}{suffix}").exists():
+            return 0
+        pattern = re.compile(rf"^{re.escape(stem)}_(\d+){re.escape(suffix)}$")
+        taken = [int(m.group(1)) for p in directory.iterdir() if (m := pattern.match(p.name))]
+        return max(taken, default=0) + 1
@@ -0,0 +1,112 @@
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from pathlib import Path
+from core.dedup import file_digest
+
+OCR_ENABLED = True
+OCR_WORKERS = 2
+OCR_MAX_PAGES = 3
+OCR_PAGE_TIMEOUT = 30          # seconds per page, enforced by tesseract itself
+OCR_TIMEOUT = 120              # seconds for the whole file, including queueing
+OCR_MIN_CHARS_PER_PAGE = 100   # fast extraction below this density triggers OCR
+OCR_DPI = 200
+OCR_RETRY_FAILED_AFTER = 24 * 3600   # timeouts/failures are cached as empty results this long
+OCR_CACHE_DB_PATH = "./data/sorterra_ocr.sqlite"
+OCR_MARKER = "[OCR Text]"
+
+def _ocr_file(path: str, max_pages: int):
+    """
+    Returns the recognized text, or None if OCR is unavailable.
+    Rendering (pdftoppm) and recognition (tesseract) run as child processes.
+    """
+    try:
+        import pytesseract
+        from PIL import Image
+    except ImportError:
+        return None
+
+    if path.lower().endswith('.pdf'):
+        try:
+            from pdf2image import convert_from_path
+        except ImportError:
+            return None
+        # pdftoppm is killed once the whole-file budget is spent
+        pages = convert_from_path(path, dpi=OCR_DPI, first_page=1, last_page=max_pages, timeout=OCR_TIMEOUT)
+        return _recognize(pytesseract, pages[:max_pages])
+    with Image.open(path) as image:
+        return _recognize(pytesseract, [image])
+
+def _recognize(pytesseract, pages):
+    texts = []
+    for page in pages:
+        try:
+            texts.append(pytesseract.image_to_string(page, timeout=OCR_PAGE_TIMEOUT))
+        except RuntimeError:
+            break  # Page timed out: keep what we have
+    return "\n".join(t.strip() for t in texts if t.strip())
+
+class OcrService:
+    """
+    Bounded OCR workers plus a result cache keyed by content digest, so a file
+    is recognized only once even after it has been renamed or moved. Timeouts
+    and failures are cached too, as empty results that expire after
+    OCR_RETRY_FAILED_AFTER, so re-extracting the file right after analysis
+    (record_placement) does not pay the timeout again.
+
+    The heavy lifting happens in tesseract/pdftoppm child processes; the pool
+    only caps how many of them run at once, so OCR never starves the rest of
+    the pipeline of CPU.
+    """
+    def __init__(self, db_path=OCR_CACHE_DB_PATH, workers=OCR_WORKERS):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS ocr_results ("
+            "digest TEXT NOT NULL, pages INTEGER NOT NULL, text TEXT NOT NULL, failed_at REAL, "
+            "PRIMARY KEY (digest, pages))"
+        )
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(ocr_results)")]
+        if "failed_at" not in columns:
+            self.conn.execute("ALTER TABLE ocr_results ADD COLUMN failed_at REAL")
+        self.conn.commit()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr")
+
+    def recognize(self, file_path: str, max_pages: int = OCR_MAX_PAGES, timeout: float = OCR_TIMEOUT):
+        """OCR text for file_path ('' if nothing was recognized or OCR recently failed), or None if unavailable."""
+        digest = file_digest(file_path)
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT text, failed_at FROM ocr_results WHERE digest = ? AND pages = ?", (digest, max_pages)
+            ).fetchone()
+        if row and (row[1] is None or time.time() - row[1] < OCR_RETRY_FAILED_AFTER):
+            return row[0]
+
+        future = self._pool.submit(_ocr_file, str(file_path), max_pages)
+        failed_at = None
+        try:
+            text = future.result(timeout=timeout)
+        except FutureTimeout:
+            future.cancel()
+            print(f"OCR timed out after {timeout}s: {Path(file_path).name}")
+            text, failed_at = "", time.time()
+        except Exception as e:
+            print(f"OCR failed for {Path(file_path).name}: {e}")
+            text, failed_at = "", time.time()
+        if text is None:
+            return None
+
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO ocr_results VALUES (?, ?, ?, ?)", (digest, max_pages, text, failed_at)
+            )
+            self.conn.commit()
+        return text
+
+def needs_ocr(text: str, pages: int):
+    return len(text.strip()) < OCR_MIN_CHARS_PER_PAGE * max(pages, 1)
+
+def has_ocr_text(content: str):
+    return OCR_MARKER in content
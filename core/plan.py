@@ -0,0 +1,39 @@
+import json
+import threading
+from pathlib import Path
+
+PLAN_MANIFEST_PATH = "./data/sorterra_plan.jsonl"
+
+class DecisionManifest:
+    """
+    Append-only JSON Lines log of sorting decisions made in plan mode.
+
+    Each tool call appends a partial record for its thread (file); decisions()
+    folds them into one {source, new_name, destination, confidence} entry per
+    file. The file is plain text so it can be reviewed or edited before apply.
+    """
+    _lock = threading.Lock()
+
+    def __init__(self, path=PLAN_MANIFEST_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def record(self, thread_id: str, **fields):
+        line = json.dumps({"thread_id": thread_id, **fields})
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + "\n")
+
+    def decisions(self):
+        if not self.path.exists():
+            return []
+        folded = {}
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                decision = folded.setdefault(record["thread_id"], {"thread_id": record["thread_id"]})
+                # The first record carries the real on-disk source; later ones may use a planned name
+                decision.setdefault("source", record.get("source"))
+                decision.update({k: v for k, v in record.items() if k not in ("thread_id", "source") and v is not None})
+        return list(folded.values())
@@ -0,0 +1,37 @@
+from pathlib import Path
+
+# How the analyzer treats each format:
+#   summarize - send the extract to Haiku for the metadata summary (False: the extract *is* the summary)
+#   memory    - look up / learn vector memory for this format (False for extracts that carry no meaning)
+#   depth     - "metadata" (name + size only), "sample" (smaller character budget) or "standard"
+DEFAULT_POLICY = {"summarize": True, "memory": True, "depth": "standard"}
+STRUCTURED_POLICY = {"summarize": False, "memory": True, "depth": "standard"}
+MEDIA_POLICY = {"summarize": False, "memory": False, "depth": "standard"}
+OPAQUE_POLICY = {"summarize": False, "memory": False, "depth": "metadata"}
+
+ANALYSIS_POLICIES = {
+    # read_file_content already returns a short structured description for these
+    'csv': STRUCTURED_POLICY,
+    'sqlite': STRUCTURED_POLICY,
+    'parquet': STRUCTURED_POLICY,
+    'zip': STRUCTURED_POLICY,
+    'png': MEDIA_POLICY,
+    'jpg': MEDIA_POLICY,
+    'jpeg': MEDIA_POLICY,
+    'bmp': MEDIA_POLICY,
+    'gif': MEDIA_POLICY,
+    'wav': MEDIA_POLICY,
+    # Machine-generated text: a small head/tail sample says what it is
+    'log': {"summarize": True, "memory": True, "depth": "sample"},
+    # Nothing an extractor can read
+    'mp3': OPAQUE_POLICY,
+    'mp4': OPAQUE_POLICY,
+    'mov': OPAQUE_POLICY,
+    'exe': OPAQUE_POLICY,
+    'bin': OPAQUE_POLICY,
+    'iso': OPAQUE_POLICY,
+    'dmg': OPAQUE_POLICY,
+}
+
+def analysis_policy(file_path: str):
+    return ANALYSIS_POLICIES.get(Path(file_path).suffix.lower().strip('.'), DEFAULT_POLICY)
@@ -0,0 +1,43 @@
+import statistics
+import threading
+
+# "confidence": Haiku decides first and hands low-confidence/conflicting files to Sonnet.
+# "thinking": every decision goes to Sonnet (previous behaviour). Overridable per run with configurable["model_routing"].
+MODEL_ROUTING = "confidence"
+ROUTE_CONFIDENCE_THRESHOLD = 0.85
+
+def normalize_folder(folder: str):
+    return "/".join(part for part in str(folder).replace("\\", "/").lower().split("/") if part)
+
+def conflicts_with_memory(destination: str, memory_destinations: list):
+    """A confident memory says something else: the decision needs the stronger model."""
+    known = {normalize_folder(d) for d in memory_destinations}
+    return bool(known) and normalize_folder(destination) not in known
+
+class RoutingStats:
+    """Per-route decision counters, latency and token usage for the current process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.routes = {}
+
+    def record(self, route: str, seconds: float, tokens: dict):
+        with self._lock:
+            entry = self.routes.setdefault(route, {"decisions": 0, "latencies": [], "tokens": {}})
+            entry["decisions"] += 1
+            entry["latencies"].append(seconds)
+            for model, count in tokens.items():
+                entry["tokens"][model] = entry["tokens"].get(model, 0) + count
+
+    def summary(self):
+        with self._lock:
+            return {
+                route: {
+                    "decisions": entry["decisions"],
+                    "median_latency": round(statistics.median(entry["latencies"]), 2),
+                    "tokens": dict(entry["tokens"]),
+                }
+                for route, entry in self.routes.items()
+            }
+
+routing_stats = RoutingStats()
@@ -1,9 +1,23 @@
-from typing import Annotated, TypedDict, List
+from typing import Annotated, TypedDict, List, Optional
 from langchain_core.messages import BaseMessage
 from langgraph.graph.message import add_messages
 
 class AgentState(TypedDict):
+    # Full history (graded and checkpointed); the agent prompts with core.agent.compact_history
     messages: Annotated[list[BaseMessage], add_messages]
     recipe: dict
     current_file: str
-    analysis_summary: str
\ No newline at end of file
+    analysis_summary: str
+    near_duplicate: dict
+    memory_destinations: list
+    decision: dict
+    decision_route: str
+    decision_seconds: float
+    decision_tokens: dict
+
+class SortDecision(TypedDict):
+    """Sorting decision for one file."""
+    destination_folder: Annotated[str, ..., "Destination folder, relative to the sorted root (e.g. 'Finance/Invoices/AWS')"]
+    new_name: Annotated[Optional[str], None, "Clean file name (keep the extension) if the current name is messy, else null"]
+    confidence: Annotated[float, ..., "Probability from 0 to 1 that destination_folder is what the rules require"]
+    conflict: Annotated[bool, ..., "True if the rules, the memory hints or the content point to different folders"]
@@ -0,0 +1,275 @@
+import os
+import shutil
+import sys
+import threading
+from pathlib import Path
+from core.journal import thread_id_for
+
+SHAREPOINT_PACKAGE_DIR = Path(__file__).resolve().parent.parent / "salesforce_connection"
+
+class NameCollision(Exception):
+    """The reserved target was taken by someone else before the move; reserve again and retry."""
+
+def _not_found(error):
+    """True for an HTTP 404 from the SharePoint REST API (requests.HTTPError)."""
+    return getattr(getattr(error, "response", None), "status_code", None) == 404
+
+class StorageBackend:
+    """
+    Where input files live and where sorted files go.
+
+    Paths are plain strings native to the backend (filesystem paths, or
+    server-relative URLs for SharePoint). Methods are blocking; the graph's
+    async tools run them in worker threads.
+    """
+    is_local = True
+    backend = "local"   # journal entries are reconciled per backend
+    sorted_root = ""
+
+    def key(self, path: str):
+        """Canonical form of path, as recorded in the journal (e.g. rename targets)."""
+        return path
+
+    def list_files(self, location: str):
+        """Files directly inside location."""
+        raise NotImplementedError
+
+    def list_new_files(self, location: str):
+        """
+        Files to sort in a delta run: those added since the last committed listing.
+        Backends without a change log list everything.
+        """
+        return self.list_files(location)
+
+    def commit_listing(self, location: str):
+        """Marks the last list_new_files of location as processed; returns whether it was."""
+        return True
+
+    def list_folders(self, location: str):
+        """Names of the subfolders of location."""
+        raise NotImplementedError
+
+    def exists(self, path: str):
+        raise NotImplementedError
+
+    def file_id(self, path: str):
+        """Stable ID of this version of the file (used as the checkpoint thread ID)."""
+        raise NotImplementedError
+
+    def local_copy(self, path: str):
+        """A local file path the content extractors can read."""
+        raise NotImplementedError
+
+    def reserve(self, destination_folder: str, name: str):
+        """Claims a collision-free target path for name inside sorted_root / destination_folder."""
+        raise NotImplementedError
+
+    def release(self, target: str):
+        """Gives back a reserved target that was not moved to (the move failed)."""
+
+    def sibling(self, path: str, name: str):
+        """Path of name in the same folder as path (rename target)."""
+        raise NotImplementedError
+
+    def move(self, source: str, target: str):
+        """Moves source to target without ever replacing a file there (raises NameCollision)."""
+        raise NotImplementedError
+
+class LocalStorage(StorageBackend):
+    """The local filesystem; sorted files go below BASE_SORTED_DIR."""
+
+    def __init__(self, sorted_root, names):
+        self.root = Path(sorted_root)
+        self.sorted_root = str(sorted_root)
+        self.names = names
+
+    def list_files(self, location):
+        path = Path(location)
+        return [str(f) for f in path.iterdir() if f.is_file()] if path.is_dir() else None
+
+    def list_folders(self, location):
+        path = Path(location)
+        return [f.name for f in path.iterdir() if f.is_dir()] if path.exists() else None
+
+    def exists(self, path):
+        return Path(path).exists()
+
+    def file_id(self, path):
+        return thread_id_for(path)
+
+    def local_copy(self, path):
+        return path
+
+    def key(self, path):
+        return str(Path(path).resolve())
+
+    def reserve(self, destination_folder, name):
+        full_dest_dir = self.root / destination_folder
+        full_dest_dir.mkdir(parents=True, exist_ok=True)
+        # Skips names already handed out or present on disk
+        return str(self.names.reserve(full_dest_dir, name))
+
+    def release(self, target):
+        self.names.release(target)
+
+    def sibling(self, path, name):
+        return str((Path(path).parent / name).resolve())
+
+    def move(self, source, target):
+        try:
+            # Claims the name atomically; the move below only replaces our own empty placeholder
+            os.close(os.open(target, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            raise NameCollision(f"{target} already exists")
+        try:
+            shutil.move(source, target)
+        except Exception:
+            if Path(source).exists():
+                Path(target).unlink(missing_ok=True)
+            raise
+
+class SharePointStorage(StorageBackend):
+    """
+    A SharePoint document library, through a pooled SharePointSorter.
+
+    Reuses the sorter's throttle-aware scheduler, known-folder cache and
+    $batch endpoint (folder creation + move in one round trip); content is
+    read through the ranged, ETag-cached SharePointContentReader. Listings
+    page through the library (no list view threshold); list_new_files walks
+    the change log instead.
+    """
+    is_local = False
+    backend = "sharepoint"
+
+    def __init__(self, sorter, sorted_root: str, reader):
+        self.sorter = sorter
+        self.sorted_root = sorted_root.rstrip('/')
+        self.reader = reader
+        # Per inbox: (change token, listed files) of the last delta listing, until committed
+        self._pending_sync = {}
+        # Lower-cased names per folder, loaded once and extended by reservations
+        self._taken = {}
+        self._lock = threading.Lock()
+
+    def _resolve(self, location):
+        """Server-relative URLs pass through; anything else is relative to sorted_root."""
+        if location.startswith('/'):
+            return location.rstrip('/')
+        return f"{self.sorted_root}/{location.strip('/')}" if location.strip('/') else self.sorted_root
+
+    def list_files(self, location):
+        folder = self._resolve(location)
+        # The inventory walks the whole subtree; keep the direct children
+        return [item["serverRelativeUrl"] for item in self.sorter.iter_folder_items(folder)
+                if item["serverRelativeUrl"].rsplit('/', 1)[0].lower() == folder.lower()]
+
+    def list_new_files(self, location):
+        """
+        Files added anywhere below location since the last committed listing (the
+        change token covers the subtree), except inside sorted_root. The token is
+        held back until commit_listing, so nothing is skipped after a failed run.
+        """
+        folder = self._resolve(location)
+        sorted_prefix = self.sorted_root.lower() + '/'
+        items = self.sorter.sync_new_files(folder, save=False)
+        files = []
+        while True:
+            try:
+                item = next(items)
+            except StopIteration as done:
+                change_token = done.value
+                break
+            if not item["serverRelativeUrl"].lower().startswith(sorted_prefix):
+                files.append(item["serverRelativeUrl"])
+        self._pending_sync[folder] = (change_token, files)
+        return files
+
+    def commit_listing(self, location):
+        """Saves the held-back change token once every listed file has left the inbox."""
+        folder = self._resolve(location)
+        if folder not in self._pending_sync:
+            return True
+        change_token, files = self._pending_sync[folder]
+        left = [f for f in files if self.exists(f)]
+        if left:
+            print(f"DELTA: {len(left)} file(s) still in {folder}; they will be listed again next run")
+            return False
+        self.sorter.save_sync_token(folder, change_token)
+        del self._pending_sync[folder]
+        return True
+
+    def list_folders(self, location):
+        return self.sorter.folder_children(self._resolve(location))["folders"]
+
+    def exists(self, path):
+        try:
+            self.reader.stat(path)
+            return True
+        except Exception as e:
+            if _not_found(e):
+                return False
+            raise  # Throttling, auth or network errors say nothing about the file
+
+    def file_id(self, path):
+        return f"{path}@{self.reader.stat(path)['etag']}"
+
+    def local_copy(self, path):
+        return str(self.reader.fetch(path))
+
+    def _load_taken(self, folder):
+        """Merges the folder's current file names into the reserved set (kept reservations stay)."""
+        try:
+            names = {n.lower() for n in self.sorter.folder_children(folder)["files"]}
+        except Exception as e:
+            if not _not_found(e):
+                raise
+            names = set()  # Folder does not exist yet; move() creates it
+        with self._lock:
+            self._taken.setdefault(folder, set()).update(names)
+
+    def reserve(self, destination_folder, name):
+        folder = self._resolve(destination_folder)
+        if folder not in self._taken:
+            self._load_taken(folder)
+
+        stem, suffix = os.path.splitext(name)
+        with self._lock:
+            taken = self._taken[folder]
+            candidate, counter = name, 0
+            while candidate.lower() in taken:
+                counter += 1
+                candidate = f"{stem}_{counter}{suffix}"
+            taken.add(candidate.lower())
+        return f"{folder}/{candidate}"
+
+    def release(self, target):
+        folder, name = target.rsplit('/', 1)
+        with self._lock:
+            self._taken.get(folder, set()).discard(name.lower())
+
+    def sibling(self, path, name):
+        return f"{path.rsplit('/', 1)[0]}/{name}"
+
+    def move(self, source, target):
+        folder, name = target.rsplit('/', 1)
+        batch = self.sorter.batch()
+        batch.create_folder(folder)
+        # Never overwrite: a file added since the folder was listed is a collision, not a target
+        batch.move_file(source, folder, new_name=name, overwrite=False)
+        failed = [r for r in batch.execute() if not r["ok"]]
+        if not failed:
+            return
+        if failed[0]["op"] == "move_file" and "already exists" in (failed[0]["error"] or "").lower():
+            # Our listing is stale: pick up what others added before the caller reserves again
+            self._load_taken(folder)
+            raise NameCollision(f"{target} already exists")
+        raise RuntimeError(f"{failed[0]['op']} {failed[0]['target']}: {failed[0]['error']}")
+
+def sharepoint_storage(sorted_root: str):
+    """SharePointStorage on the shared, env-configured session of salesforce_connection/agent_tools.py."""
+    if str(SHAREPOINT_PACKAGE_DIR) not in sys.path:
+        sys.path.insert(0, str(SHAREPOINT_PACKAGE_DIR))
+    import agent_tools
+    from content_reader import SharePointContentReader
+    sorter = agent_tools._get_sorter()
+    return SharePointStorage(sorter, sorted_root, SharePointContentReader(sorter))
@@ -0,0 +1,145 @@
+import codecs
+import mmap
+import os
+
+# Share of the character budget for each part of a large file
+HEAD_SHARE = 0.4
+TAIL_SHARE = 0.3
+SAMPLE_SLICES = 4          # evenly spaced slices between head and tail share the rest
+LINE_ALIGN_WINDOW = 1024   # how far to look for a line break when aligning a slice
+MAX_CHAR_BYTES = 4         # bytes read per budgeted character (UTF-8/16/32 worst case)
+
+_BOMS = [
+    (codecs.BOM_UTF32_LE, 'utf-32-le'), (codecs.BOM_UTF32_BE, 'utf-32-be'),
+    (codecs.BOM_UTF8, 'utf-8'), (codecs.BOM_UTF16_LE, 'utf-16-le'), (codecs.BOM_UTF16_BE, 'utf-16-be'),
+]
+
+def detect_encoding(sample: bytes):
+    """Encoding of a byte sample: BOM, UTF-16 NUL pattern, strict UTF-8, then charset_normalizer if installed."""
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
+    if len(sample) >= 4:
+        even, odd = sample[0::2], sample[1::2]
+        if odd.count(0) > len(odd) * 0.3 and even.count(0) < len(even) * 0.05:
+            return 'utf-16-le'
+        if even.count(0) > len(even) * 0.3 and odd.count(0) < len(odd) * 0.05:
+            return 'utf-16-be'
+    try:
+        # A multi-byte character cut at the end of the sample is not an error
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    try:
+        from charset_normalizer import from_bytes
+        best = from_bytes(sample).best()
+        if best:
+            return best.encoding
+    except ImportError:
+        pass
+    return 'cp1252'
+
+def _unit(encoding: str):
+    return 4 if encoding.startswith('utf-32') else 2 if encoding.startswith('utf-16') else 1
+
+def _align(data, offset: int, unit: int, end: int, encoding: str):
+    """Moves offset to the start of the next line (or code unit for UTF-16/32, character for UTF-8)."""
+    if unit > 1:
+        return offset - offset % unit
+    newline = data.find(b'\n', offset, min(offset + LINE_ALIGN_WINDOW, end))
+    return newline + 1 if newline != -1 else _char_boundary(data, offset, end, encoding)
+
+def _char_boundary(data, offset: int, end: int, encoding: str):
+    """First offset at or after offset that does not split a UTF-8 sequence."""
+    if encoding == 'utf-8':
+        while offset < end and 0x80 <= data[offset] < 0xC0:
+            offset += 1
+    return offset
+
+def _budget(max_chars: int):
+    """(head, slice, tail) character shares of max_chars."""
+    head_chars = int(max_chars * HEAD_SHARE)
+    tail_chars = int(max_chars * TAIL_SHARE)
+    return head_chars, (max_chars - head_chars - tail_chars) // SAMPLE_SLICES, tail_chars
+
+def _sample_decoded(text: str, max_chars: int):
+    """The same head/slices/tail sample, for a file small enough to have been decoded whole."""
+    head_chars, slice_chars, tail_chars = _budget(max_chars)
+    tail_start = len(text) - tail_chars
+    parts = [(0, head_chars)]
+    for i in range(1, SAMPLE_SLICES + 1):
+        start = max(len(text) * i // (SAMPLE_SLICES + 1), head_chars)
+        newline = text.find('\n', start, min(start + LINE_ALIGN_WINDOW, tail_start))
+        start = newline + 1 if newline != -1 else start
+        parts.append((start, min(start + slice_chars, tail_start)))
+    parts.append((tail_start, len(text)))
+
+    chunks, previous_end = [], 0
+    for start, end in parts:
+        start = max(start, previous_end)
+        if start >= end:
+            continue
+        if start > previous_end:
+            chunks.append(f"\n[... {start - previous_end} characters skipped ...]\n")
+        chunks.append(text[start:end])
+        previous_end = end
+    return "".join(chunks)
+
+def sample_text(path, max_chars: int):
+    """
+    Reads up to max_chars characters of a text file in constant memory.
+
+    Small files are read whole. Larger ones are memory-mapped and sampled: the
+    head, evenly spaced slices from the middle and the tail (where logs keep
+    their most recent entries), each aligned to a line (or character) start.
+    Shares of the budget are counted in decoded characters, so multi-byte text
+    gets as many characters as ASCII. The encoding is detected on the sampled
+    bytes only.
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        if size == 0:
+            return ""
+        probe = f.read(min(size, 64 * 1024))
+        encoding = detect_encoding(probe)
+        unit = _unit(encoding)
+        if size <= max_chars * MAX_CHAR_BYTES:
+            text = (probe + f.read()).decode(encoding, errors='replace').lstrip('\ufeff')
+            if len(text) <= max_chars:
+                return text
+            return _sample_decoded(text, max_chars)
+
+        head_chars, slice_chars, tail_chars = _budget(max_chars)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            # (start, end, characters to keep, keep them from the end)
+            # Larger than max_chars * MAX_CHAR_BYTES, so these byte regions never overlap
+            head_end = _char_boundary(data, head_chars * MAX_CHAR_BYTES, size, encoding)
+            parts = [(0, head_end, head_chars, False)]
+            tail_start = size - tail_chars * MAX_CHAR_BYTES
+            for i in range(1, SAMPLE_SLICES + 1):
+                # Fixed fractions of the file, so a ranged spool (content_reader.py) can fetch just these
+                start = _align(data, max(size * i // (SAMPLE_SLICES + 1), head_end), unit, tail_start, encoding)
+                end = _char_boundary(data, min(start + slice_chars * MAX_CHAR_BYTES, tail_start), tail_start, encoding)
+                parts.append((start, end, slice_chars, False))
+            tail_start = _align(data, tail_start, unit, size, encoding)
+            parts.append((tail_start, size, tail_chars, True))
+
+            chunks, previous_end = [], 0
+            for start, end, chars, from_end in parts:
+                start = max(start, previous_end)
+                if start >= end:
+                    continue
+                text = data[start:end].decode(encoding, errors='replace')
+                # Byte length of the characters kept, so the skip markers stay exact
+                if from_end:
+                    text = text[-chars:]
+                    start = end - len(text.encode(encoding, errors='replace'))
+                else:
+                    text = text[:chars]
+                    end = start + len(text.encode(encoding, errors='replace'))
+                if start > previous_end:
+                    chunks.append(f"\n[... {start - previous_end} bytes skipped ...]\n")
+                chunks.append(text.lstrip('\ufeff'))
+                previous_end = end
+        return "".join(chunks)
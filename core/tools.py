@@ -1,59 +1,46 @@
-import shutil
+import asyncio
 from pathlib import Path
 from langchain_unstructured import UnstructuredLoader
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_chroma import Chroma
 from langchain_core.tools import tool
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_core.runnables import RunnableConfig
+from langgraph.prebuilt import InjectedState
+from typing import Annotated
 import os
 import sqlite3
 import json
-import zipfile
 import wave
 from pathlib import Path
 import pandas as pd
 from PIL import Image
 from langchain_unstructured import UnstructuredLoader
 from langchain_core.tools import tool
+from core.journal import MoveJournal
+from core.dedup import ContentHashIndex, NearDuplicateIndex
+from core.plan import DecisionManifest, PLAN_MANIFEST_PATH
+from core.naming import NameReservations
+from core.storage import LocalStorage, NameCollision
+from core.policy import analysis_policy
+from core.archive import inspect_archive
+from core.text_sampler import sample_text
+from core.ocr import OcrService, OCR_ENABLED, OCR_MARKER, needs_ocr, has_ocr_text
+from core.memory import DEFAULT_COLLECTION, memory_partition
+from core.memory_service import open_memory
 
-VECTOR_DB_PATH = "./data/sorterra_memory"
-EMBEDDING_MODEL = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
 BASE_SORTED_DIR = Path("data/sorted_data")
 MAX_CHARS = 8000 
+SAMPLE_CHARS = 2000
+MOVE_COLLISION_RETRIES = 3
 
-class SorterraMemory:
-    def __init__(self):
-        self.db = Chroma(persist_directory=VECTOR_DB_PATH, embedding_function=EMBEDDING_MODEL, collection_metadata={"hnsw:space": "cosine"})
-
-    def get_similar_mapping(self, content: str):
-        try:
-            # Use similarity_search_with_score instead
-            results = self.db.similarity_search_with_score(content, k=5)
-            
-            # With cosine distance, 0 is a perfect match and higher numbers are further away.
-            # Adjusted threshold: only keep matches with distance < 0.6
-            confident_results = [r for r in results if r[1] < 0.6]
-            
-            if not confident_results:
-                return "No high-confidence matches in memory."
-                
-            return "\n".join([f"Previously sorted to '{d.metadata.get('destination')}' (Dist: {s:.2f})" for d, s in confident_results])
-        except Exception as e:
-            return f"Memory access error: {str(e)}"
-
-    def learn_new_move(self, content: str, destination: str):
-        # Split text into manageable pieces
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000, 
-            chunk_overlap=100
-        )
-        chunks = text_splitter.split_text(content)
-        
-        # Store each chunk with the same destination metadata
-        metadatas = [{"destination": destination} for _ in chunks]
-        self.db.add_texts(texts=chunks, metadatas=metadatas)
-
-memory = SorterraMemory()
+memory = open_memory(DEFAULT_COLLECTION)
+journal = MoveJournal()
+hash_index = ContentHashIndex()
+near_index = NearDuplicateIndex()
+names = NameReservations()
+ocr_service = OcrService()
+# Storage backends by name; runs pick one with configurable["storage"] (default "local")
+STORAGE = {"local": LocalStorage(BASE_SORTED_DIR, names)}
+# Vector memories by Chroma collection; runs pick one with configurable["memory"]
+MEMORIES = {DEFAULT_COLLECTION: memory}
 
 
 
@@ -63,18 +50,29 @@ def read_file_content(file_path: str):
     Extracts text, schema, or metadata from 23+ file types (PDF, CSV, SQLite, Images, etc.).
     Optimized for efficiency and context window safety.
     """
+    return extract_content(file_path)
+
+def extract_content(file_path: str, depth: str = "standard"):
+    """
+    read_file_content with an extraction depth (see core/policy.py):
+    "metadata" reads nothing but the file's stat, "sample" works with a smaller character budget.
+    """
     path = Path(file_path)
     if not path.exists():
         return f"Error: {file_path} not found."
 
     ext = path.suffix.lower().strip('.')
-    
+    limit = MAX_CHARS if depth == "standard" else SAMPLE_CHARS
+
+    if depth == "metadata":
+        return f"[{ext.upper() or 'Unknown'} File]: {path.name}, {path.stat().st_size} bytes"
+
     try:
         # 1. Specialized Handlers (Fast & Low Memory)
         if ext in ['json', 'yaml', 'yml', 'ini', 'log', 'txt', 'md']:
-            with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read(MAX_CHARS)
-                return f"[{ext.upper()} Content (truncated)]:\n{content}"
+            # Head, middle slices and tail via mmap: constant I/O however large the file is
+            content = sample_text(path, limit)
+            return f"[{ext.upper()} Content (sampled)]:\n{content}"
         
         elif ext == 'csv':
             df = pd.read_csv(path, nrows=10)
@@ -94,11 +92,13 @@ def read_file_content(file_path: str):
             
         elif ext in ['png', 'jpg', 'jpeg', 'bmp', 'gif']:
             with Image.open(path) as img:
-                return f"[Image Metadata]: Format: {img.format}, Size: {img.size}, Mode: {img.mode}"
+                metadata = f"[Image Metadata]: Format: {img.format}, Size: {img.size}, Mode: {img.mode}"
+            # Metadata carries no text at all: scans and screenshots only become sortable through OCR
+            return metadata + _ocr_section(path, "", 1, depth)
                 
         elif ext == 'zip':
-            with zipfile.ZipFile(path, 'r') as zf:
-                return f"[ZIP Contents]: {', '.join(zf.namelist()[:20])}" # Limit to first 20 files
+            # Streams member headers and bounded prefixes; nested documents go back through this extractor
+            return inspect_archive(path, lambda member: extract_content(member, "sample"), limit)
                 
         elif ext == 'wav':
             with wave.open(str(path), 'rb') as wf:
@@ -110,11 +110,14 @@ def read_file_content(file_path: str):
         loader = UnstructuredLoader(str(path), mode="elements", strategy="fast")
         docs = loader.load()
         full_text = "\n\n".join([d.page_content for d in docs])
+        if ext == 'pdf':
+            pages = max([d.metadata.get("page_number") or 1 for d in docs], default=1)
+            full_text += _ocr_section(path, full_text, pages, depth)
         
         # 3. Context Window Management
-        if len(full_text) > MAX_CHARS:
+        if len(full_text) > limit:
             # Head and Tail sampling: captures both the title/intro and any concluding info
-            half = MAX_CHARS // 2
+            half = limit // 2
             return full_text[:half] + "\n\n[... content truncated ...]\n\n" + full_text[-half:]
         
         return full_text
@@ -122,69 +125,167 @@ def read_file_content(file_path: str):
     except Exception as e:
         return f"Error reading {path.name}: {str(e)}"
 
-@tool
-def move_file(source_path: str, destination_folder: str):
-    """Moves file to the sorted_data directory without overwriting existing files."""
-    source = Path(source_path)
-    full_dest_dir = BASE_SORTED_DIR / destination_folder
-    full_dest_dir.mkdir(parents=True, exist_ok=True)
-    
-    target_path = full_dest_dir / source.name
-    counter = 1
-    while target_path.exists():
-        # e.g., 'grocery_list.txt' -> 'grocery_list_1.txt'
-        target_path = full_dest_dir / f"{source.stem}_{counter}{source.suffix}"
-        counter += 1
-    
+def _ocr_section(path: Path, text: str, pages: int, depth: str):
+    """OCR text to append when a fast extraction is too sparse (standard depth only)."""
+    if not OCR_ENABLED or depth != "standard" or not needs_ocr(text, pages):
+        return ""
+    recognized = ocr_service.recognize(str(path))
+    return f"\n\n{OCR_MARKER}:\n{recognized}" if recognized else ""
+
+def record_placement(target_path: str, destination_folder: str, learn: bool = True, storage=None, vector_memory=None):
+    """Feeds a completed placement into vector memory and the duplicate indexes."""
+    storage = storage or STORAGE["local"]
+    policy = analysis_policy(target_path)
+    if learn:
+        # OCR results are cached, so re-extracting the placed file is cheap
+        content = extract_content(storage.local_copy(target_path), policy["depth"])
+        if "Error" not in content and (policy["memory"] or has_ocr_text(content)):
+            vector_memory = vector_memory or memory
+            vector_memory.learn_new_move(content, destination_folder)
+            near_index.add(content, destination_folder, target_path, vector_memory.collection_name)
+    if storage.is_local:
+        # Exact-duplicate lookups hash local files only
+        hash_index.record(target_path, destination_folder)
+
+def plan_manifest(config: RunnableConfig):
+    """Returns the DecisionManifest when the run is in plan mode, else None."""
+    configurable = config.get("configurable", {})
+    if configurable.get("mode") != "plan":
+        return None
+    return DecisionManifest(configurable.get("manifest", PLAN_MANIFEST_PATH))
+
+def storage_for(config: RunnableConfig):
+    """The storage backend selected for this run."""
+    return STORAGE[config.get("configurable", {}).get("storage", "local")]
+
+def memory_for(config: RunnableConfig, recipe: dict = None):
+    """
+    The vector memory selected for this run: configurable["memory"] if given,
+    else the partition of the run's recipe (and configurable["tenant"]).
+    """
+    configurable = config.get("configurable", {})
+    name = configurable.get("memory") or memory_partition((recipe or {}).get("name"), configurable.get("tenant"))
+    if name not in MEMORIES:
+        MEMORIES[name] = open_memory(name)
+    return MEMORIES[name]
+
+def place_file(source_path: str, destination_folder: str, thread_id: str = "", learn: bool = True, storage=None,
+               vector_memory=None):
+    """
+    Journaled move into the storage's sorted root / destination_folder.
+    learn=False skips memory learning (used for exact duplicates already in memory).
+    """
+    storage = storage or STORAGE["local"]
+    name = Path(source_path).name
+
+    # A resumed run replays the interrupted tool call; the journal makes it idempotent
+    entry = journal.find(thread_id, "move", source_path)
+    if entry and entry["status"] == "done":
+        return entry["result"]
+
+    if entry:
+        op_id, target_path = entry["id"], entry["target"]
+    else:
+        for attempt in range(MOVE_COLLISION_RETRIES + 1):
+            target_path = storage.reserve(destination_folder, name)
+            op_id = journal.begin(thread_id, "move", source_path, target_path, storage.backend)
+            try:
+                storage.move(source_path, target_path) # Uses unique target_path
+                break
+            except NameCollision as e:
+                # Someone else created the reserved name meanwhile (so it stays taken): take the next one
+                journal.mark(op_id, "failed", str(e))
+                if attempt == MOVE_COLLISION_RETRIES:
+                    return f"Failed: {str(e)}"
+            except Exception as e:
+                journal.mark(op_id, "failed", str(e))
+                storage.release(target_path)
+                return f"Failed: {str(e)}"
+        journal.mark(op_id, "applied")
+
     try:
-        content = read_file_content.invoke(source_path)
-        shutil.move(str(source), str(target_path)) # Uses unique target_path
-        if "Error" not in content:
-            memory.learn_new_move(content, destination_folder)
-        return f"Moved {source.name} to {target_path}."
+        # A replay of an 'applied' entry skips the move and only finishes the learning step
+        record_placement(target_path, destination_folder, learn, storage, vector_memory)
+        result = f"Moved {name} to {target_path}."
+        journal.mark(op_id, "done", result)
+        return result
     except Exception as e:
         return f"Failed: {str(e)}"
 
 @tool
-def list_local_files(directory: str):
+async def move_file(source_path: str, destination_folder: str, config: RunnableConfig,
+                    state: Annotated[dict, InjectedState], confidence: float = 1.0):
     """
-    Lists all files currently residing in a specified local directory. 
+    Moves file into the sorted root (destination_folder is relative to it) without overwriting existing files.
+    confidence: your confidence (0-1) that destination_folder is correct.
+    """
+    thread_id = config.get("configurable", {}).get("thread_id", "")
+    manifest = plan_manifest(config)
+    if manifest:
+        manifest.record(thread_id, source=source_path, destination=destination_folder, confidence=confidence,
+                        memory=memory_for(config, state.get("recipe")).collection_name)
+        return f"Planned move of {Path(source_path).name} to {destination_folder}."
+    return await asyncio.to_thread(place_file, source_path, destination_folder, thread_id, True,
+                                   storage_for(config), memory_for(config, state.get("recipe")))
+
+@tool
+async def list_files(directory: str, config: RunnableConfig):
+    """
+    Lists all files currently residing in a specified directory. 
     Use this tool to find files that need to be processed, renamed, or sorted.
     """
-    path = Path(directory)
-    return [str(f) for f in path.iterdir() if f.is_file()] if path.is_dir() else f"Error: {directory} not found."
+    files = await asyncio.to_thread(storage_for(config).list_files, directory)
+    return files if files is not None else f"Error: {directory} not found."
 
 
 @tool
-def rename_file(source_path: str, new_name: str):
+async def rename_file(source_path: str, new_name: str, config: RunnableConfig):
     """
     Changes the name of a file at a specific source_path to a provided new_name. 
     This is useful for cleaning up randomized or messy filenames (e.g., removing random suffixes) before organizing them.
+    Never overwrites: if new_name is already taken in that folder, nothing changes and you must pick another name.
     """
-    source = Path(source_path)
-    if not source.exists():
+    thread_id = config.get("configurable", {}).get("thread_id", "")
+    manifest = plan_manifest(config)
+    if manifest:
+        # Nothing is touched in plan mode; the agent continues with the planned name
+        manifest.record(thread_id, source=source_path, new_name=new_name)
+        return f"Renamed to {new_name} (planned)."
+
+    entry = journal.find(thread_id, "rename", source_path)
+    if entry:
+        return entry["result"] or f"Renamed to {new_name}."
+
+    storage = storage_for(config)
+    if not await asyncio.to_thread(storage.exists, source_path):
         return f"Error: {source_path} not found."
+    new_path = storage.sibling(source_path, new_name)
+    op_id = journal.begin(thread_id, "rename", source_path, new_path, storage.backend)
     try:
-        new_path = source.parent / new_name
-        source.rename(new_path)
-        return f"Renamed to {new_name}."
+        # Never clobbers: another file (possibly renamed concurrently) may already have this name
+        await asyncio.to_thread(storage.move, source_path, new_path)
+        result = f"Renamed to {new_name}."
+        journal.mark(op_id, "done", result)
+        return result
+    except NameCollision:
+        result = f"Failed: a file named {new_name} already exists there. Choose a different name."
+        journal.mark(op_id, "failed", result)
+        return result
     except Exception as e:
+        journal.mark(op_id, "failed", str(e))
         return f"Failed: {str(e)}"
 
 
 @tool
-def list_folders(directory: str):
+async def list_folders(directory: str, config: RunnableConfig):
     """
-    Lists all subdirectories within a specified local directory. 
+    Lists all subdirectories within a specified directory. 
     Use this tool to discover existing categories or project folders 
-    (e.g., in 'data/sorted_data') to maintain organizational consistency.
+    (e.g., in the sorted root) to maintain organizational consistency.
     """
-    path = Path(directory)
-    if not path.exists():
-        return f"Error: Directory {directory} not found."
-    
     # Returns only folder names for cleaner LLM reasoning
-    return [f.name for f in path.iterdir() if f.is_dir()]
+    folders = await asyncio.to_thread(storage_for(config).list_folders, directory)
+    return folders if folders is not None else f"Error: Directory {directory} not found."
 
 # Update the TOOLS list to include the new tool
-TOOLS = [move_file, list_local_files, read_file_content, rename_file, list_folders]
\ No newline at end of file
+TOOLS = [move_file, list_files, read_file_content, rename_file, list_folders]
\ No newline at end of file
@@ -1,10 +1,23 @@
-from core.agent import app
-from core.tools import list_local_files
+import argparse
+import asyncio
+from pathlib import Path
+from core.agent import open_app
+from core.routing import routing_stats
+from core.apply import apply_manifest
+from core.bootstrap import bootstrap_memory
+from core.plan import DecisionManifest, PLAN_MANIFEST_PATH
+from core.storage import sharepoint_storage
+from core.memory import LEGACY_RECIPE_NAME, list_partitions, memory_partition
+from core.tools import BASE_SORTED_DIR, MEMORIES, STORAGE, journal, hash_index, memory_for, place_file
 from langchain_core.messages import HumanMessage
 
 TEST_FOLDER = "./data/test_folder"
+# Exact duplicates of already-sorted files: "route" them to the same destination, or just "flag" them
+DUPLICATE_POLICY = "route"
+# Files sorted concurrently; SharePoint calls are additionally paced by its request scheduler
+MAX_CONCURRENT_FILES = 4
 DEFAULT_RECIPE = {
-    "name": "ACME Corp Enterprise Sort",
+    "name": LEGACY_RECIPE_NAME,  # keeps the memory learned before partitioning
     "rules": [
         "1. If a file is an invoice or mentions a vendor (e.g., AWS, Stripe), move to 'Finance/Invoices/[VendorName]'.",
         "2. If it mentions a specific Project (Alpha, Beta, Phoenix, etc.), move to 'Projects/[ProjectName]'.",
@@ -15,26 +28,146 @@ DEFAULT_RECIPE = {
     ]
 }
 
-if __name__ == "__main__":
-    files = list_local_files.invoke(TEST_FOLDER)
-    
-    for file_path in files:
+async def sort_file(app, storage_name, file_path, plan_path=None, tenant=None):
+    """Runs one file through the graph (or resumes/skips it using its checkpoint thread)."""
+    storage = STORAGE[storage_name]
+    name = Path(file_path).name
+    # Renamed-but-not-yet-moved files continue on the thread that renamed them
+    thread_id = journal.thread_for(storage.key(file_path)) or await asyncio.to_thread(storage.file_id, file_path)
+    configurable = {"thread_id": thread_id, "storage": storage_name}
+    if plan_path:
+        # Plan threads are separate so a later real run does not treat them as finished
+        configurable = {"thread_id": f"plan:{thread_id}", "mode": "plan", "manifest": plan_path}
+    if tenant:
+        # Memory is partitioned per tenant and recipe
+        configurable["tenant"] = tenant
+    config = {"configurable": configurable}
+    snapshot = await app.aget_state(config)
+
+    if snapshot.values and not snapshot.next:
+        print(f"\n>>> SKIPPING (already finished): {file_path}")
+        return
+
+    if not snapshot.values and storage.is_local:
+        # Exact-duplicate short circuit: no extraction, no LLM calls, no graph
+        duplicate = await asyncio.to_thread(hash_index.lookup, file_path)
+        if duplicate:
+            print(f"\n>>> DUPLICATE: {file_path} == {duplicate['sorted_path']}")
+            if DUPLICATE_POLICY == "route" and plan_path:
+                # Not learned again on apply (memory already holds this content), only indexed
+                DecisionManifest(plan_path).record(configurable["thread_id"], source=file_path,
+                                                   destination=duplicate['destination'], confidence=1.0,
+                                                   memory=memory_for(config, DEFAULT_RECIPE).collection_name,
+                                                   learn=False)
+            elif DUPLICATE_POLICY == "route":
+                result = await asyncio.to_thread(place_file, file_path, duplicate['destination'], thread_id, False)
+                print(f"RESULT [{name}]: {result}")
+            return
+
+    if snapshot.next:
+        print(f"\n>>> RESUMING: {file_path} (next: {', '.join(snapshot.next)})")
+        inputs = None
+    else:
         print(f"\n>>> PROCESSING: {file_path}")
         inputs = {
             "messages": [HumanMessage(content=f"Sort this file: {file_path}")],
             "recipe": DEFAULT_RECIPE,
             "current_file": file_path
         }
-        
-        for output in app.stream(inputs, stream_mode="updates"):
-            for node, values in output.items():
-                # Node Completion Marker (Quiet)
-                if node == "analyzer":
-                    print(f"Analysis Complete.")
-                
-                # Log actual tool execution results
-                if node == "tools" and "messages" in values:
-                    last_msg = values["messages"][-1]
-                    print(f"RESULT: {last_msg.content}")
-
-        print(f"--- Finished ---\n")
\ No newline at end of file
+
+    async for output in app.astream(inputs, config, stream_mode="updates"):
+        for node, values in output.items():
+            # Node Completion Marker (Quiet)
+            if node == "analyzer":
+                print(f"Analysis Complete: {name}")
+
+            # Log actual tool execution results
+            if node == "tools" and "messages" in values:
+                last_msg = values["messages"][-1]
+                print(f"RESULT [{name}]: {last_msg.content}")
+
+    print(f"--- Finished {name} ---\n")
+
+async def sort_folder(folder, plan_path=None, storage_name="local", tenant=None, delta=False):
+    """
+    Runs every file through the graph, MAX_CONCURRENT_FILES at a time.
+    With plan_path, decisions go to a manifest instead of the storage.
+    With delta, only files added since the last completed delta run are listed.
+    """
+    storage = STORAGE[storage_name]
+    listing = storage.list_new_files if delta else storage.list_files
+    files = await asyncio.to_thread(listing, folder) or []
+    limit = asyncio.Semaphore(MAX_CONCURRENT_FILES)
+
+    async with open_app() as app:
+        async def run(file_path):
+            async with limit:
+                try:
+                    await sort_file(app, storage_name, file_path, plan_path, tenant)
+                except Exception as e:
+                    print(f"ERROR [{Path(file_path).name}]: {e}")
+
+        await asyncio.gather(*(run(f) for f in files))
+
+    if delta:
+        # Advances the change token only if every listed file was sorted
+        await asyncio.to_thread(storage.commit_listing, folder)
+
+    for route, stats in routing_stats.summary().items():
+        print(f"ROUTING {route}: {stats['decisions']} decision(s), median {stats['median_latency']}s, tokens {stats['tokens']}")
+    for name, vector_memory in MEMORIES.items():
+        if vector_memory.searches:
+            print(f"MEMORY {name}: {vector_memory.searches} search(es), hit rate {vector_memory.hits / vector_memory.searches:.0%}")
+
+def manage_memory(compact=None):
+    """Prints stats for every memory partition; compact="" compacts all of them, a name just that one."""
+    for name in list_partitions():
+        vector_memory = memory_for({"configurable": {"memory": name}})
+        if compact is not None and compact in ("", name):
+            print(f"COMPACTED {name}: {vector_memory.compact()} chunk(s) removed")
+        print(f"MEMORY {name}: {vector_memory.stats()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sorterra file sorting agent")
+    parser.add_argument("--plan", nargs="?", const=PLAN_MANIFEST_PATH, metavar="MANIFEST",
+                        help="Decide only: write a decision manifest instead of moving files")
+    parser.add_argument("--apply", nargs="?", const=PLAN_MANIFEST_PATH, metavar="MANIFEST",
+                        help="Execute a decision manifest in bulk")
+    parser.add_argument("--min-confidence", type=float, default=0.0,
+                        help="With --apply, leave decisions below this confidence for review")
+    parser.add_argument("--sharepoint", metavar="INBOX_URL",
+                        help="Sort a SharePoint folder (server-relative URL) instead of the local test folder")
+    parser.add_argument("--sorted-root", metavar="FOLDER_URL",
+                        help="With --sharepoint, the server-relative folder that receives sorted files")
+    parser.add_argument("--sharepoint-delta", action="store_true",
+                        help="With --sharepoint, only sort files added below the inbox since the last "
+                             "--sharepoint-delta run that sorted all of its files")
+    parser.add_argument("--bootstrap", nargs="?", const=str(BASE_SORTED_DIR), metavar="SORTED_ROOT",
+                        help="Teach vector memory from an existing hand-sorted tree, then exit")
+    parser.add_argument("--tenant",
+                        help="Tenant key; vector memory is partitioned per tenant and recipe")
+    parser.add_argument("--memory-stats", action="store_true",
+                        help="Print the size of every memory partition, then exit")
+    parser.add_argument("--compact-memory", nargs="?", const="", metavar="PARTITION",
+                        help="Compact one memory partition (default: all of them), then exit")
+    args = parser.parse_args()
+
+    if args.sharepoint and not args.sorted_root:
+        parser.error("--sharepoint requires --sorted-root")
+    if args.sharepoint and (args.plan or args.apply):
+        parser.error("--plan/--apply work on the local filesystem only")
+
+    if args.memory_stats or args.compact_memory is not None:
+        manage_memory(args.compact_memory)
+    elif args.bootstrap:
+        bootstrap_memory(args.bootstrap, memory_partition(DEFAULT_RECIPE["name"], args.tenant))
+    elif args.apply:
+        apply_manifest(args.apply, args.min_confidence)
+    elif args.sharepoint:
+        STORAGE["sharepoint"] = sharepoint_storage(args.sorted_root)
+        # Pending remote moves from an interrupted run are checked against SharePoint itself
+        journal.recover(STORAGE["sharepoint"].backend, STORAGE["sharepoint"].exists)
+        asyncio.run(sort_folder(args.sharepoint, storage_name="sharepoint", tenant=args.tenant,
+                                delta=args.sharepoint_delta))
+    else:
+        asyncio.run(sort_folder(TEST_FOLDER, plan_path=args.plan, tenant=args.tenant))
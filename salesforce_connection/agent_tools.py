@@ -7,8 +7,10 @@
 import os
 import msal
 import json
+import threading
 from dotenv import load_dotenv
 from sharepoint_client import SharePointSorter
+from content_reader import SharePointContentReader
 
 # Load environment variables once
 load_dotenv()
@@ -19,22 +21,34 @@ CLIENT_ID = os.getenv("CLIENT_ID")
 TENANT_ID = os.getenv("TENANT_ID")
 THUMBPRINT = os.getenv("THUMBPRINT")
 PRIVATE_KEY_PATH = os.getenv("PRIVATE_KEY_PATH")
+MAX_CONCURRENCY = int(os.getenv("SHAREPOINT_MAX_CONCURRENCY", "8"))
+
+# Process-wide session: one client context, token cache and connection pool for all tools
+_sorter = None
+_reader = None
+_sorter_lock = threading.Lock()
 
 def _get_sorter():
     """
-    Internal helper to get an authenticated SharePointSorter instance.
+    Internal helper to get the shared, authenticated SharePointSorter instance.
     Authentication is handled here so the Agent doesn't need to worry about it.
     """
-    if not all([SITE_URL, CLIENT_ID, THUMBPRINT, PRIVATE_KEY_PATH]):
-        raise ValueError("Missing environment variables for SharePoint connection.")
-    
-    return SharePointSorter(
-        SITE_URL, 
-        CLIENT_ID, 
-        thumbprint=THUMBPRINT, 
-        private_key_path=PRIVATE_KEY_PATH, 
-        tenant_id=TENANT_ID
-    )
+    global _sorter
+    if _sorter is None:
+        with _sorter_lock:
+            if _sorter is None:
+                if not all([SITE_URL, CLIENT_ID, THUMBPRINT, PRIVATE_KEY_PATH]):
+                    raise ValueError("Missing environment variables for SharePoint connection.")
+
+                _sorter = SharePointSorter(
+                    SITE_URL, 
+                    CLIENT_ID, 
+                    thumbprint=THUMBPRINT, 
+                    private_key_path=PRIVATE_KEY_PATH, 
+                    tenant_id=TENANT_ID,
+                    max_concurrency=MAX_CONCURRENCY
+                )
+    return _sorter
 
 # =============================================================================
 # INSPECTION TOOLS (The "Look" Phase)
@@ -54,6 +68,50 @@ def list_folder_contents(folder_relative_url):
     files = sorter.get_files_in_folder(folder_relative_url)
     return [{"name": f.name, "serverRelativeUrl": f.serverRelativeUrl} for f in files]
 
+def list_folder_contents_recursive(folder_relative_url):
+    """
+    Lists every file below a SharePoint folder, including subfolders.
+    Pages through the library, so it works on very large libraries.
+    
+    Args:
+        folder_relative_url (str): The server-relative URL to inventory.
+        
+    Yields:
+        dict: File entries with 'name', 'serverRelativeUrl', 'id' and 'modified'.
+    """
+    sorter = _get_sorter()
+    yield from sorter.iter_folder_items(folder_relative_url)
+
+def list_new_documents(folder_relative_url):
+    """
+    Lists only the files added below a folder since the previous call (delta sync).
+    The first call returns the full inventory and records a change token.
+    
+    Args:
+        folder_relative_url (str): The server-relative URL of the inbox folder.
+        
+    Yields:
+        dict: File entries with 'name', 'serverRelativeUrl', 'id' and 'modified'.
+    """
+    sorter = _get_sorter()
+    yield from sorter.sync_new_files(folder_relative_url)
+
+def fetch_document_for_analysis(file_url):
+    """
+    Spools just the analysis-relevant bytes of a document to a local cache
+    (ranged reads: text head/middle/tail, ZIP directory + small parts, PDF head/tail).
+    
+    Args:
+        file_url (str): The server-relative URL of the file.
+        
+    Returns:
+        str: Local path to pass to the content extractor.
+    """
+    global _reader
+    if _reader is None:
+        _reader = SharePointContentReader(_get_sorter())
+    return str(_reader.fetch(file_url))
+
 def get_folder_hierarchy(folder_relative_url):
     """
     Scans the folder structure to understand the layout (subfolders and files).
@@ -71,6 +129,11 @@ def get_folder_hierarchy(folder_relative_url):
 # ACTION TOOLS (The "Act" Phase)
 # =============================================================================
 
+def _raise_on_failure(results):
+    failed = [r for r in results if not r["ok"]]
+    if failed:
+        raise Exception("; ".join(f"{r['op']} {r['target']}: {r['error']}" for r in failed))
+
 def move_document(file_url, destination_folder_url):
     """
     Moves a document to a destination folder.
@@ -84,11 +147,11 @@ def move_document(file_url, destination_folder_url):
     """
     sorter = _get_sorter()
     
-    # Ensure destination exists
-    sorter.create_folder(destination_folder_url)
-    
-    # Move
-    sorter.move_file(file_url, destination_folder_url)
+    # Ensure destination exists + move, in a single $batch request
+    batch = sorter.batch()
+    batch.create_folder(destination_folder_url)
+    batch.move_file(file_url, destination_folder_url)
+    _raise_on_failure(batch.execute())
     return f"Successfully moved {file_url} to {destination_folder_url}"
 
 def secure_move_document(file_url, destination_folder_url, source_permissions_folder_url):
@@ -106,22 +169,55 @@ def secure_move_document(file_url, destination_folder_url, source_permissions_fo
     """
     sorter = _get_sorter()
     
-    # 1. Read Permissions
-    permissions = sorter.get_folder_permissions(source_permissions_folder_url)
+    # 1. Read Permissions (cached template)
+    permissions = sorter.get_permission_template(source_permissions_folder_url)
     
-    # 2. Ensure Dest Exists
-    sorter.create_folder(destination_folder_url)
-    
-    # 3. Move
-    sorter.move_file(file_url, destination_folder_url)
-    
-    # 4. Apply Permissions
+    # 2-4. Ensure Dest Exists, Move, Apply Permissions - one $batch request
     file_name = file_url.split('/')[-1]
     new_file_url = f"{destination_folder_url.rstrip('/')}/{file_name}"
-    
-    sorter.apply_unique_permissions(new_file_url, permissions)
+
+    batch = sorter.batch()
+    batch.create_folder(destination_folder_url)
+    batch.move_file(file_url, destination_folder_url)
+    # A destination that already grants the same ACL needs no unique permissions
+    identical = sorter.permissions_match(destination_folder_url, permissions)
+    if not identical:
+        batch.apply_unique_permissions(new_file_url, permissions)
+    _raise_on_failure(batch.execute())
+
+    if identical:
+        return f"Moved {file_name}; destination already has the required permissions."
     return f"Moved {file_name} and applied {len(permissions)} unique permission entries."
 
+def bulk_move_documents(moves, source_permissions_folder_url=None):
+    """
+    Moves many documents at once using batched requests (up to 100 sub-requests each).
+    
+    Args:
+        moves (list[dict]): Items with 'file_url' and 'destination_folder_url'.
+        source_permissions_folder_url (str, optional): Copy this folder's permissions onto every moved file.
+        
+    Returns:
+        list[dict]: One result per operation with 'op', 'target', 'ok' and 'error' (partial failures included).
+    """
+    sorter = _get_sorter()
+    permissions = sorter.get_permission_template(source_permissions_folder_url) if source_permissions_folder_url else None
+
+    batch = sorter.batch()
+    destinations = list(dict.fromkeys(m['destination_folder_url'] for m in moves))
+    for destination in destinations:
+        batch.create_folder(destination)
+    # Permission comparisons are independent reads: run them concurrently
+    matches = sorter.scheduler.map(lambda d: sorter.permissions_match(d, permissions), destinations) \
+        if permissions is not None else [True] * len(destinations)
+    needs_acl = {d: not match for d, match in zip(destinations, matches)}
+    for move in moves:
+        batch.move_file(move['file_url'], move['destination_folder_url'])
+        if needs_acl[move['destination_folder_url']]:
+            new_file_url = f"{move['destination_folder_url'].rstrip('/')}/{move['file_url'].split('/')[-1]}"
+            batch.apply_unique_permissions(new_file_url, permissions)
+    return batch.execute()
+
 def create_directory(folder_url, color_hex=None):
     """
     Creates a folder and optionally sets its color.
@@ -138,3 +234,12 @@ def create_directory(folder_url, color_hex=None):
         return f"Created folder {folder_url} with color {color_hex}"
     
     return f"Created folder {folder_url}"
+
+def sharepoint_request_stats():
+    """
+    Reports request counters of the shared SharePoint session.
+    
+    Returns:
+        dict: requests, throttled, retries, wait_seconds, concurrency_limit, in_flight.
+    """
+    return _get_sorter().scheduler.stats()
@@ -0,0 +1,233 @@
+# =============================================================================
+# RANGED CONTENT FETCH FOR ANALYSIS
+# =============================================================================
+# Produces a local copy of a SharePoint file that contains just enough bytes for
+# the local extractors (core/tools.py read_file_content) to analyze it, using
+# HTTP range requests instead of downloading the whole file:
+#
+#   * text formats  -> head, tail and evenly spaced middle windows (the parts
+#     core/text_sampler.py samples) in a sparse file of the original size
+#   * images / wav  -> the header block only
+#   * ZIP containers (zip, docx, pptx, xlsx) -> central directory + small members;
+#     large members (embedded media) are written back empty
+#   * PDF           -> head and tail (xref) in a sparse file of the original size
+#
+# Files below FULL_FETCH_LIMIT are streamed whole. Spooled copies live in a
+# size-limited cache keyed by ETag, so an unchanged file is never fetched twice.
+# The ETag carries the file's unique ID, not its URL, so the copy spooled for
+# analysis is reused after the file has been moved or renamed.
+
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import zipfile
+from collections import OrderedDict
+from pathlib import Path
+
+TEXT_EXTENSIONS = {'json', 'yaml', 'yml', 'ini', 'log', 'txt', 'md', 'csv'}
+HEADER_EXTENSIONS = {'png', 'jpg', 'jpeg', 'bmp', 'gif', 'wav'}
+ZIP_CONTAINERS = {'zip', 'docx', 'pptx', 'xlsx'}
+
+FULL_FETCH_LIMIT = 8 * 1024 * 1024
+TEXT_HEAD_BYTES = 64 * 1024
+TEXT_TAIL_BYTES = 64 * 1024
+TEXT_SLICE_BYTES = 16 * 1024
+TEXT_SLICES = 4            # core/text_sampler.py SAMPLE_SLICES
+HEADER_BYTES = 256 * 1024
+PDF_HEAD_BYTES = 4 * 1024 * 1024
+PDF_TAIL_BYTES = 1024 * 1024
+ZIP_MEMBER_LIMIT = 1024 * 1024
+RANGE_BLOCK_SIZE = 256 * 1024
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+CACHE_DIR = "./data/sharepoint_cache"
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+
+class RangedFile(io.RawIOBase):
+    """
+    Seekable, read-only view of a remote file that fetches RANGE_BLOCK_SIZE blocks
+    on demand (with a small LRU), so zipfile & co. only pull the bytes they touch.
+    """
+
+    def __init__(self, fetch_range, size, max_blocks=64):
+        self._fetch_range = fetch_range
+        self._size = size
+        self._pos = 0
+        self._blocks = OrderedDict()
+        self._max_blocks = max_blocks
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: self._size}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def readinto(self, buffer):
+        end = min(self._pos + len(buffer), self._size)
+        if self._pos >= end:
+            return 0
+        data = bytearray()
+        position = self._pos
+        while position < end:
+            index = position // RANGE_BLOCK_SIZE
+            block = self._block(index)
+            offset = position - index * RANGE_BLOCK_SIZE
+            data += block[offset:offset + (end - position)]
+            position = index * RANGE_BLOCK_SIZE + len(block)
+        buffer[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+    def _block(self, index):
+        if index in self._blocks:
+            self._blocks.move_to_end(index)
+            return self._blocks[index]
+        start = index * RANGE_BLOCK_SIZE
+        block = self._fetch_range(start, min(start + RANGE_BLOCK_SIZE, self._size))
+        self._blocks[index] = block
+        if len(self._blocks) > self._max_blocks:
+            self._blocks.popitem(last=False)
+        return block
+
+
+class SharePointContentReader:
+    """Ranged, ETag-cached fetcher that spools SharePoint files for local analysis."""
+
+    def __init__(self, sorter, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.sorter = sorter
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _headers(self, **extra):
+        return {"Authorization": f"Bearer {self.sorter._acquire_token().accessToken}", **extra}
+
+    def stat(self, file_url):
+        data = self.sorter._rest("GET", f"{self.sorter._file_api(file_url)}?$select=Name,Length,ETag")["d"]
+        return {"name": data["Name"], "size": int(data["Length"]), "etag": data["ETag"]}
+
+    def fetch_range(self, file_url, start, end):
+        """Bytes [start, end) of the file; tolerates servers that ignore Range."""
+        response = self.sorter.http.get(
+            f"{self.sorter._file_api(file_url)}/$value",
+            headers=self._headers(Range=f"bytes={start}-{end - 1}"),
+            stream=True,
+        )
+        response.raise_for_status()
+        with response:
+            if response.status_code == 206:
+                return response.content
+            # Full body returned: skip to start, keep only what was asked for
+            data = bytearray()
+            for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                data += chunk
+                if len(data) >= end:
+                    break
+            return bytes(data[start:end])
+
+    def fetch(self, file_url):
+        """
+        Returns a local Path holding the analysis-relevant bytes of file_url.
+        The file keeps its original name (after a cache-key prefix) so extractors
+        dispatch on the right extension.
+        """
+        info = self.stat(file_url)
+        key = hashlib.sha1(info['etag'].encode('utf-8')).hexdigest()[:16]
+        path = self.cache_dir / f"{key}_{info['name']}"
+        if not path.exists():
+            # Spooled under its name before a move/rename: take it over under the new name
+            previous = [p for p in self.cache_dir.glob(f"{key}_*")
+                        if p.suffix.lower() == path.suffix.lower() and not p.name.endswith(".part")]
+            if previous:
+                try:
+                    os.replace(previous[0], path)
+                except FileNotFoundError:
+                    pass  # Taken over (or evicted) concurrently
+        if path.exists():
+            os.utime(path)
+            return path
+
+        ext = path.suffix.lower().strip('.')
+        size = info["size"]
+        # A temp file of its own per call: concurrent fetches of one ETag never share a
+        # half-written file, and whichever finishes last publishes a complete copy
+        fd, partial = tempfile.mkstemp(dir=self.cache_dir, prefix=f"{path.name}.", suffix=".part")
+        os.close(fd)
+        partial = Path(partial)
+        try:
+            if size <= FULL_FETCH_LIMIT:
+                self._download(file_url, partial)
+            elif ext in TEXT_EXTENSIONS:
+                self._spool_sparse(file_url, size, partial, self._text_ranges(size))
+            elif ext in HEADER_EXTENSIONS:
+                partial.write_bytes(self.fetch_range(file_url, 0, HEADER_BYTES))
+            elif ext in ZIP_CONTAINERS:
+                self._spool_zip(file_url, size, partial)
+            elif ext == 'pdf':
+                self._spool_sparse(file_url, size, partial, [(0, PDF_HEAD_BYTES), (size - PDF_TAIL_BYTES, size)])
+            else:
+                self._download(file_url, partial)
+            os.replace(partial, path)
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            raise
+
+        self._evict()
+        return path
+
+    def _download(self, file_url, target):
+        response = self.sorter.http.get(f"{self.sorter._file_api(file_url)}/$value", headers=self._headers(), stream=True)
+        response.raise_for_status()
+        with response, open(target, 'wb') as f:
+            for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                f.write(chunk)
+
+    def _spool_zip(self, file_url, size, target):
+        """Rebuilds the archive locally from its central directory, blanking large members."""
+        remote = io.BufferedReader(RangedFile(lambda a, b: self.fetch_range(file_url, a, b), size), RANGE_BLOCK_SIZE)
+        with zipfile.ZipFile(remote) as source, zipfile.ZipFile(target, 'w') as spooled:
+            for info in source.infolist():
+                data = source.read(info) if info.file_size <= ZIP_MEMBER_LIMIT else b""
+                spooled.writestr(info, data)
+
+    @staticmethod
+    def _text_ranges(size):
+        """Head, tail, and a window from each point where the sampler starts a middle slice."""
+        ranges = [(0, TEXT_HEAD_BYTES)]
+        for i in range(1, TEXT_SLICES + 1):
+            center = size * i // (TEXT_SLICES + 1)
+            ranges.append((center, center + TEXT_SLICE_BYTES))
+        ranges.append((size - TEXT_TAIL_BYTES, size))
+        return ranges
+
+    def _spool_sparse(self, file_url, size, target, ranges):
+        """Sparse local copy of the original size: the given [start, end) ranges are real, zeros elsewhere."""
+        with open(target, 'wb') as f:
+            for start, end in ranges:
+                f.seek(start)
+                f.write(self.fetch_range(file_url, start, end))
+            f.truncate(size)
+
+    def _evict(self):
+        """Drops least recently used spooled files until the cache fits max_bytes."""
+        with self._lock:
+            entries = [(p.stat().st_mtime, p.stat().st_size, p) for p in self.cache_dir.iterdir()
+                       if p.is_file() and not p.name.endswith(".part")]
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
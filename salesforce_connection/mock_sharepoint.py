@@ -0,0 +1,260 @@
+# =============================================================================
+# MOCK SHAREPOINT SERVER
+# =============================================================================
+# A small in-memory stand-in for the SharePoint REST endpoints used by
+# SharePointSorter, for exercising the client locally without a tenant:
+#
+#   server = MockSharePoint(folders=["/sites/Test/Shared Documents/Inbox"],
+#                           files={"/sites/Test/Shared Documents/Inbox/a.pdf": b"..."})
+#   server.start()
+#   sorter = mock_sorter(server)
+#   batch = sorter.batch(); batch.move_file(...); batch.execute()
+#   server.stop()
+
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+from sharepoint_client import SharePointSorter
+
+SITE_PATH = "/sites/Test"
+
+
+def _unquote_literal(value):
+    return unquote(value).replace("''", "'")
+
+
+class MockSharePoint:
+    """In-memory SharePoint site served over HTTP on localhost."""
+
+    def __init__(self, folders=(), files=None, site_path=SITE_PATH):
+        self.site_path = site_path
+        self.folders = set()
+        self.files = {}
+        self.item_ids = {}
+        self.changes = []
+        self.permissions = {}
+        self.requests = []
+        self.bytes_served = 0
+        self.fail_urls = set()
+        # Throttling injection: the next `throttle_next` requests get 429 + Retry-After
+        self.throttle_next = 0
+        self.retry_after = 1
+        self._lock = threading.Lock()
+        self._server = None
+        for folder in folders:
+            self.add_folder(folder)
+        for url, content in (files or {}).items():
+            self.add_file(url, content)
+
+    @property
+    def site_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{self.site_path}"
+
+    def add_folder(self, url):
+        self.folders.add(url)
+        self._register(url)
+
+    def add_file(self, url, content=b""):
+        self.files[url] = content
+        self._register(url)
+
+    def _register(self, url):
+        """Assigns a list item ID and records an Add in the change log."""
+        if url not in self.item_ids:
+            self.item_ids[url] = len(self.item_ids) + 1
+        self.changes.append((self.item_ids[url], 1))
+
+    def _item(self, url):
+        return {"Id": self.item_ids[url], "FileRef": url, "FileLeafRef": url.rsplit('/', 1)[-1],
+                "FSObjType": 1 if url in self.folders else 0, "Modified": "2026-01-01T00:00:00Z"}
+
+    def start(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length).decode('utf-8')
+                with mock._lock:
+                    mock.requests.append((self.command, self.path))
+                if self._throttled():
+                    return
+                if self.path.endswith("/_api/$batch"):
+                    boundary = "batchresponse_mock"
+                    payload = mock._handle_batch(body, boundary)
+                    self._reply(200, payload, f"multipart/mixed; boundary={boundary}")
+                else:
+                    status, data = mock._handle("POST", self.path, body)
+                    self._reply(status, json.dumps(data), "application/json")
+
+            def do_GET(self):
+                with mock._lock:
+                    mock.requests.append((self.command, self.path))
+                if self._throttled():
+                    return
+                if m := re.search(r"/GetFileByServerRelativeUrl\('(.+?)'\)/\$value$", self.path):
+                    self._send_content(_unquote_literal(m.group(1)))
+                    return
+                status, data = mock._handle("GET", self.path)
+                self._reply(status, json.dumps(data), "application/json")
+
+            def _throttled(self):
+                with mock._lock:
+                    if mock.throttle_next <= 0:
+                        return False
+                    mock.throttle_next -= 1
+                payload = json.dumps(mock._error("The request has been throttled")).encode('utf-8')
+                self.send_response(429)
+                self.send_header("Retry-After", str(mock.retry_after))
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                return True
+
+            def _send_content(self, url):
+                content = mock.files.get(url)
+                if content is None:
+                    self._reply(404, json.dumps(mock._error(f"File Not Found: {url}")), "application/json")
+                    return
+                if m := re.match(r"bytes=(\d+)-(\d+)", self.headers.get("Range", "")):
+                    start, end = int(m.group(1)), min(int(m.group(2)) + 1, len(content))
+                    mock.bytes_served += end - start
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end - 1}/{len(content)}")
+                    self.send_header("Content-Length", str(end - start))
+                    self.end_headers()
+                    self.wfile.write(content[start:end])
+                    return
+                mock.bytes_served += len(content)
+                self._reply(200, content, "application/octet-stream")
+
+            def _reply(self, status, payload, content_type):
+                encoded = payload.encode('utf-8') if isinstance(payload, str) else payload
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(encoded)))
+                self.end_headers()
+                self.wfile.write(encoded)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    # -------------------------------------------------------------------------
+    # Request handling
+    # -------------------------------------------------------------------------
+
+    def _handle_batch(self, body, boundary):
+        parts = []
+        for method, url in re.findall(r"^(GET|POST|PUT|PATCH|DELETE) (\S+) HTTP/1\.1", body, flags=re.M):
+            path = re.sub(r"^https?://[^/]+", "", url)
+            status, data = self._handle(method, path)
+            parts.append(
+                f"--{boundary}\r\n"
+                "Content-Type: application/http\r\n"
+                "Content-Transfer-Encoding: binary\r\n\r\n"
+                f"HTTP/1.1 {status} {'OK' if status < 400 else 'Error'}\r\n"
+                "Content-Type: application/json;odata=verbose\r\n\r\n"
+                f"{json.dumps(data)}\r\n"
+            )
+        return "".join(parts) + f"--{boundary}--\r\n"
+
+    def _handle(self, method, path, body=None):
+        split = urlsplit(path)
+        query = {k: v[0] for k, v in parse_qs(split.query).items()}
+        with self._lock:
+            for url in self.fail_urls:
+                if url in unquote(path):
+                    return 500, self._error("Injected failure")
+
+            if m := re.search(r"/web/folders/add\('(.+)'\)$", path):
+                self.folders.add(_unquote_literal(m.group(1)))
+                return 200, {"d": {"ServerRelativeUrl": _unquote_literal(m.group(1))}}
+
+            if m := re.search(r"/GetFileByServerRelativeUrl\('(.+?)'\)/moveto\(newurl='(.+)',flags=(\d+)\)$", path):
+                source, target = _unquote_literal(m.group(1)), _unquote_literal(m.group(2))
+                if source not in self.files:
+                    return 404, self._error(f"File Not Found: {source}")
+                if target in self.files and not int(m.group(3)) & 1:
+                    return 400, self._error(f"A file with the name {target} already exists.")
+                if target.rsplit('/', 1)[0] not in self.folders:
+                    return 404, self._error(f"Folder Not Found: {target.rsplit('/', 1)[0]}")
+                self.files[target] = self.files.pop(source)
+                self.item_ids[target] = self.item_ids.pop(source)
+                return 200, {"d": {"MoveTo": None}}
+
+            if m := re.search(r"/GetFileByServerRelativeUrl\('(.+?)'\)/ListItemAllFields/breakroleinheritance", path):
+                self.permissions[_unquote_literal(m.group(1))] = []
+                return 200, {"d": {"BreakRoleInheritance": None}}
+
+            if m := re.search(r"/GetFileByServerRelativeUrl\('(.+?)'\)/ListItemAllFields/roleassignments/"
+                              r"addroleassignment\(principalid=(\d+),roledefid=(\d+)\)", path):
+                url = _unquote_literal(m.group(1))
+                self.permissions.setdefault(url, []).append((int(m.group(2)), int(m.group(3))))
+                return 200, {"d": {"AddRoleAssignment": None}}
+
+            if m := re.search(r"/GetFileByServerRelativeUrl\('(.+?)'\)$", split.path):
+                url = _unquote_literal(m.group(1))
+                if url not in self.files:
+                    return 404, self._error(f"File Not Found: {url}")
+                etag = f'"{{{self.item_ids[url]:08d}-0000-0000-0000-000000000000}},{len(self.files[url])}"'
+                return 200, {"d": {"Name": url.rsplit('/', 1)[-1], "Length": str(len(self.files[url])), "ETag": etag}}
+
+            if m := re.search(r"/GetFolderByServerRelativeUrl\('(.+?)'\)$", split.path):
+                folder = _unquote_literal(m.group(1))
+                if folder not in self.folders:
+                    return 404, self._error(f"Folder Not Found: {folder}")
+                files = [{"Name": u.rsplit('/', 1)[-1]} for u in self.files if u.rsplit('/', 1)[0] == folder]
+                folders = [{"Name": u.rsplit('/', 1)[-1]} for u in self.folders if u.rsplit('/', 1)[0] == folder]
+                return 200, {"d": {"Files": {"results": files}, "Folders": {"results": folders}}}
+
+            if re.search(r"/GetList\('(.+?)'\)/items$", split.path):
+                items = sorted((self._item(url) for url in self.item_ids), key=lambda i: i["Id"])
+                if "$filter" in query:
+                    wanted = {int(i) for i in re.findall(r"Id eq (\d+)", query["$filter"])}
+                    return 200, {"d": {"results": [i for i in items if i["Id"] in wanted]}}
+                top = int(query.get("$top", 100))
+                after = int(query.get("$skiptoken", "p_ID=0").split("p_ID=")[-1])
+                page = [i for i in items if i["Id"] > after][:top]
+                data = {"results": page}
+                if len(page) == top and page[-1]["Id"] < items[-1]["Id"]:
+                    data["__next"] = f"{self.site_url.split(self.site_path)[0]}{split.path}?$select={query.get('$select', '')}" \
+                                     f"&$orderby=Id&$top={top}&$skiptoken=Paged=TRUE%26p_ID={page[-1]['Id']}"
+                return 200, {"d": data}
+
+            if re.search(r"/GetList\('(.+?)'\)$", split.path) and query.get("$select") == "CurrentChangeToken":
+                return 200, {"d": {"CurrentChangeToken": {"StringValue": f"mock;{len(self.changes)}"}}}
+
+            if re.search(r"/GetList\('(.+?)'\)/GetChanges$", split.path):
+                start = int(json.loads(body)["query"]["ChangeTokenStart"]["StringValue"].split(";")[1])
+                results = [
+                    {"ItemId": item_id, "ChangeType": change_type, "ChangeToken": {"StringValue": f"mock;{seq}"}}
+                    for seq, (item_id, change_type) in enumerate(self.changes[start:start + 1000], start=start + 1)
+                ]
+                return 200, {"d": {"results": results}}
+
+        return 404, self._error(f"Unsupported mock endpoint: {method} {path}")
+
+    @staticmethod
+    def _error(message):
+        return {"error": {"code": "-1, Microsoft.SharePoint.SPException", "message": {"lang": "en-US", "value": message}}}
+
+
+def mock_sorter(server):
+    """A SharePointSorter pointed at the mock, with a pre-seeded token (no MSAL call)."""
+    sorter = SharePointSorter(server.site_url, "mock-client", thumbprint="mock", private_key_path="unused")
+    sorter._token = {"access_token": "mock-token", "token_type": "Bearer"}
+    sorter._token_expires_at = time.time() + 24 * 3600
+    return sorter
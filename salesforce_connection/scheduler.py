@@ -0,0 +1,138 @@
+# =============================================================================
+# THROTTLE-AWARE REQUEST SCHEDULER
+# =============================================================================
+# Every HTTP request made by a SharePointSorter (client context, REST helpers,
+# $batch, ranged downloads) passes through a ThrottledAdapter mounted on its
+# session. The adapter:
+#
+#   * gates in-flight requests through an AIMD limit: +1/limit per success,
+#     halved on 429/503 or a high X-SharePointHealthScore;
+#   * honours Retry-After by pausing *all* requests until it has elapsed,
+#     falling back to capped exponential backoff with jitter;
+#   * counts requests, throttles, retries and time spent waiting.
+#
+# RequestScheduler.map() runs independent operations on a thread pool; the AIMD
+# limit, not the pool size, decides how many of them talk to SharePoint at once.
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
+
+MAX_CONCURRENCY = 8
+MAX_RETRIES = 6
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 60.0
+THROTTLE_STATUSES = (429, 503)
+# SharePoint reports server load 0-10; back off before it starts throttling
+HEALTH_SCORE_THRESHOLD = 8
+
+
+def _retry_after(response):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RequestScheduler:
+    """Concurrency limiter + worker pool shared by all requests of one SharePointSorter."""
+
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, max_retries=MAX_RETRIES):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.resume_at = 0.0
+        self.counters = {"requests": 0, "throttled": 0, "retries": 0, "wait_seconds": 0.0}
+        self._cond = threading.Condition()
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="sharepoint")
+
+    def acquire(self):
+        """Blocks until a Retry-After pause is over and a slot under the AIMD limit is free."""
+        started = time.time()
+        with self._cond:
+            while True:
+                pause = self.resume_at - time.time()
+                if pause > 0:
+                    self._cond.wait(pause)
+                elif self.in_flight < max(1, int(self.limit)):
+                    break
+                else:
+                    self._cond.wait()
+            self.in_flight += 1
+            self.counters["requests"] += 1
+            self.counters["wait_seconds"] += time.time() - started
+
+    def release(self, throttled=False, retry_after=None, degraded=False):
+        with self._cond:
+            self.in_flight -= 1
+            if throttled or degraded:
+                self.limit = max(1.0, self.limit / 2)
+            else:
+                self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+            if throttled:
+                self.counters["throttled"] += 1
+                if retry_after is not None:
+                    self.resume_at = max(self.resume_at, time.time() + retry_after)
+            self._cond.notify_all()
+
+    def backoff(self, seconds):
+        with self._cond:
+            self.counters["retries"] += 1
+            self.counters["wait_seconds"] += seconds
+        time.sleep(seconds)
+
+    def map(self, fn, items):
+        """
+        Runs fn over items concurrently, returning results in input order.
+        Do not call from inside fn (the pool would wait on itself).
+        """
+        futures = [self._pool.submit(fn, item) for item in items]
+        return [f.result() for f in futures]
+
+    def stats(self):
+        with self._cond:
+            return {**self.counters, "concurrency_limit": round(self.limit, 2), "in_flight": self.in_flight}
+
+
+class ThrottledAdapter(HTTPAdapter):
+    """HTTPAdapter that sends through a RequestScheduler and retries throttled responses."""
+
+    def __init__(self, scheduler, **kwargs):
+        super().__init__(**kwargs)
+        self.scheduler = scheduler
+
+    def send(self, request, **kwargs):
+        attempt = 0
+        while True:
+            self.scheduler.acquire()
+            try:
+                response = super().send(request, **kwargs)
+            except Exception:
+                self.scheduler.release()
+                raise
+
+            throttled = response.status_code in THROTTLE_STATUSES
+            health = response.headers.get("X-SharePointHealthScore", "")
+            degraded = health.isdigit() and int(health) >= HEALTH_SCORE_THRESHOLD
+            retry_after = _retry_after(response) if throttled else None
+            self.scheduler.release(throttled, retry_after, degraded)
+
+            if not throttled or attempt >= self.scheduler.max_retries:
+                return response
+            response.close()
+            attempt += 1
+            # With Retry-After the pause is enforced for every thread by the next acquire()
+            delay = 0.0 if retry_after is not None else min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt)
+            self.scheduler.backoff(delay * random.uniform(0.5, 1.0))
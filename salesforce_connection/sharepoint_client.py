@@ -1,18 +1,113 @@
 import os
+import re
+import uuid
 import msal
 import json
+import threading
+import time
+import requests
+from urllib.parse import quote, urlparse
 from office365.sharepoint.client_context import ClientContext
 from office365.runtime.auth.token_response import TokenResponse
 from office365.sharepoint.files.file import File
+from scheduler import RequestScheduler, ThrottledAdapter, MAX_CONCURRENCY
+
+# Renew cached tokens this many seconds before they expire
+TOKEN_REFRESH_MARGIN = 300
+# Keep-alive connections shared by every request of a SharePointSorter
+HTTP_POOL_SIZE = 32
+# SharePoint Online rejects $batch payloads with more than 100 sub-requests
+BATCH_MAX_REQUESTS = 100
+# Items per page for library inventory (SharePoint caps $top at 5000)
+INVENTORY_PAGE_SIZE = 5000
+# Change tokens persisted between delta syncs, keyed by folder URL
+SYNC_STATE_PATH = "./data/sharepoint_sync_state.json"
+# SP.ChangeType values that bring a file into a library: Add, MoveInto
+_ADDED_CHANGE_TYPES = (1, 6)
+# How long a folder's role assignments are reused as a permission template (seconds)
+PERMISSION_TEMPLATE_TTL = 300
+
+# One MSAL application per credential set, shared process-wide (private key is read once)
+_msal_apps = {}
+_msal_apps_lock = threading.Lock()
+
+def _get_msal_app(client_id, tenant_id, thumbprint, private_key_path):
+    key = (client_id, tenant_id, thumbprint, private_key_path)
+    with _msal_apps_lock:
+        if key not in _msal_apps:
+            with open(private_key_path, 'r') as f:
+                private_key = f.read()
+            _msal_apps[key] = msal.ConfidentialClientApplication(
+                client_id,
+                authority=f"https://login.microsoftonline.com/{tenant_id}",
+                client_credential={
+                    "thumbprint": thumbprint,
+                    "private_key": private_key
+                }
+            )
+        return _msal_apps[key]
+
+class KnownFolders:
+    """
+    Per-site set of folder URLs known to exist, shared by every sorter in the process.
+
+    Filled by successful folder creations and folder scans; any error touching a
+    folder evicts it (and everything below it) so the next call re-checks the server.
+    """
+    _sites = {}
+    _lock = threading.Lock()
+
+    def __init__(self, site_url):
+        self.site_url = site_url.rstrip('/').lower()
+        with KnownFolders._lock:
+            self.folders = KnownFolders._sites.setdefault(self.site_url, set())
+
+    @staticmethod
+    def _key(folder_url):
+        return folder_url.rstrip('/').lower()
+
+    def __contains__(self, folder_url):
+        return self._key(folder_url) in self.folders
+
+    def add(self, folder_url):
+        """Marks the folder and all of its ancestors as existing."""
+        parts = self._key(folder_url).split('/')
+        with KnownFolders._lock:
+            for i in range(2, len(parts) + 1):
+                self.folders.add('/'.join(parts[:i]))
+
+    def discard(self, folder_url):
+        key = self._key(folder_url)
+        with KnownFolders._lock:
+            self.folders.difference_update({f for f in self.folders if f == key or f.startswith(key + '/')})
+
 
 class SharePointSorter:
-    def __init__(self, site_url, client_id, thumbprint=None, private_key_path=None, client_secret=None, tenant_id=None):
+    def __init__(self, site_url, client_id, thumbprint=None, private_key_path=None, client_secret=None, tenant_id=None,
+                 max_concurrency=MAX_CONCURRENCY):
         """
         Connects to SharePoint using MSAL (Modern Auth) or Client Secret (Legacy).
         
         Recommended: use `thumbprint` and `private_key_path` for Certificate Authentication.
+        `max_concurrency` caps concurrent requests; throttling lowers the effective limit.
         """
         self.site_url = site_url
+
+        # Pooled HTTP session reused by the client contexts and direct REST calls.
+        # Every request goes through the throttle-aware scheduler.
+        self.scheduler = RequestScheduler(max_concurrency)
+        self.http = requests.Session()
+        adapter = ThrottledAdapter(self.scheduler, pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+        self.http.mount("https://", adapter)
+        self.http.mount("http://", adapter)
+
+        self._token = None
+        self._token_expires_at = 0
+        self._token_lock = threading.Lock()
+
+        self.known_folders = KnownFolders(site_url)
+        self._permission_templates = {}
+        self._permission_lock = threading.Lock()
         
         if thumbprint and private_key_path:
             # CERTIFICATE AUTH via MSAL
@@ -25,12 +120,29 @@ class SharePointSorter:
             # Determine Tenant ID or Authority
             # Use 'common' if not provided, but for Cert auth specific tenant is better
             self.tenant_id = tenant_id if tenant_id else "common"
-            
-            self.context = ClientContext(site_url).with_access_token(self._acquire_token)
         else:
             # SECRET AUTH (Legacy / Dev)
             self._use_msal = False
-            self.context = ClientContext(site_url).with_client_credentials(client_id, client_secret)
+            self._client_credentials = (client_id, client_secret)
+
+        self._local = threading.local()
+
+    @property
+    def context(self):
+        """
+        ClientContext for the calling thread. Contexts queue pending queries and
+        are not thread-safe, so each scheduler worker gets its own; all of them
+        share the token cache and the pooled session.
+        """
+        ctx = getattr(self._local, "context", None)
+        if ctx is None:
+            if self._use_msal:
+                ctx = ClientContext(self.site_url).with_access_token(self._acquire_token)
+            else:
+                ctx = ClientContext(self.site_url).with_client_credentials(*self._client_credentials)
+            ctx.with_transport(session=self.http)
+            self._local.context = ctx
+        return ctx
 
     # =========================================================================
     # AUTHENTICATION
@@ -40,34 +152,30 @@ class SharePointSorter:
         """
         Acquires a Bearer token using MSAL with a Self-Signed Certificate.
         This provides a secure, non-interactive way to authenticate as an Application.
+
+        Tokens are cached in memory and renewed TOKEN_REFRESH_MARGIN seconds before
+        they expire; the returned expiresIn is the remaining lifetime minus that margin
+        so the client context refreshes in step with this cache.
         """
-        # Read Private Key
-        with open(self.private_key_path, 'r') as f:
-            private_key = f.read()
+        with self._token_lock:
+            now = time.time()
+            if self._token is None or now >= self._token_expires_at - TOKEN_REFRESH_MARGIN:
+                app = _get_msal_app(self.client_id, self.tenant_id, self.thumbprint, self.private_key_path)
 
-        authority = f"https://login.microsoftonline.com/{self.tenant_id}"
-        
-        app = msal.ConfidentialClientApplication(
-            self.client_id,
-            authority=authority,
-            client_credential={
-                "thumbprint": self.thumbprint,
-                "private_key": private_key
-            }
-        )
+                # Build Scope
+                # e.g. https://contoso.sharepoint.com/.default
+                sharepoint_host = "https://" + self.site_url.split('/')[2]
+                scope = [f"{sharepoint_host}/.default"]
 
-        # Build Scope
-        # e.g. https://contoso.sharepoint.com/.default
-        sharepoint_host = "https://" + self.site_url.split('/')[2]
-        scope = [f"{sharepoint_host}/.default"]
-        
-        result = app.acquire_token_for_client(scopes=scope)
-        
-        if "access_token" in result:
-            expires_in = result.get('expires_in', 3599)
-            return TokenResponse(result['access_token'], result.get('token_type', 'Bearer'), expiresIn=expires_in)
-        else:
-            raise Exception(f"Could not acquire token: {result.get('error_description')}")
+                result = app.acquire_token_for_client(scopes=scope)
+
+                if "access_token" not in result:
+                    raise Exception(f"Could not acquire token: {result.get('error_description')}")
+                self._token = result
+                self._token_expires_at = now + int(result.get('expires_in', 3599))
+
+            remaining = int(self._token_expires_at - now - TOKEN_REFRESH_MARGIN)
+            return TokenResponse(self._token['access_token'], self._token.get('token_type', 'Bearer'), expiresIn=max(remaining, 1))
 
 
     # =========================================================================
@@ -93,10 +201,6 @@ class SharePointSorter:
         """
         Returns a collection of File objects in the specified folder.
         """
-        root_web = self.context.web
-        self.context.load(root_web)
-        self.context.execute_query()
-        
         # Resolve folder
         folder = self.context.web.get_folder_by_server_relative_url(folder_url)
         files = folder.files
@@ -109,7 +213,14 @@ class SharePointSorter:
         Ensures a folder exists at the specified path.
         If it does not exist, it creates it.
         """
-        self.context.web.ensure_folder_path(folder_url).execute_query()
+        if folder_url in self.known_folders:
+            return
+        try:
+            self.context.web.ensure_folder_path(folder_url).execute_query()
+        except Exception:
+            self.known_folders.discard(folder_url)
+            raise
+        self.known_folders.add(folder_url)
         # print(f"Ensured folder exists: {folder_url}") # Optional log
 
     def move_file(self, source_file_url, dest_folder_url):
@@ -132,75 +243,12 @@ class SharePointSorter:
              dest_path = f"{dest_folder_url}"
         
         print(f"Moving {source_file_url} -> {dest_path}")
-        file.moveto(dest_path, 1).execute_query()
-
-    def scan_folder_structure(self, folder_url):
-        """
-        Returns a dictionary representing the folder structure (Names of files and subfolders).
-        """
-        root = {}
-        
-        ctx = self.context
-        web = ctx.web
-        
-        # Get the main folder
-        folder = web.get_folder_by_server_relative_url(folder_url)
-        # Expand Folders and Files explicitly
-        ctx.load(folder, ["Folders", "Files", "Name"])
-        ctx.execute_query()
-        
-        root['name'] = folder.name
-        root['files'] = [f.name for f in folder.files]
-        root['folders'] = []
-        
-        for sub_folder in folder.folders:
-             root['folders'].append(sub_folder.name)
-             
-        return root
-
-    def set_folder_color(self, folder_url, color_hex="6"):
-        """
-        Sets the folder color using Modern SharePoint APIs.
-        Colors: 0=Yellow, 1=DarkRed, 2=DarkOrange, 3=DarkGreen, 4=LightBlue, 5=LightTeal, 6=Blue (Default)
-        """
         try:
-            import requests
-            
-            # Ensure we have a token
-            token_response = self._acquire_token()
-            token = token_response.accessToken
-            
-            # Method 1: Modern API stampcolor
-            api_endpoint = f"{self.site_url}/_api/foldercoloring/stampcolor(DecodedUrl='{folder_url}')"
-            
-            try:
-                color_int = int(color_hex)
-            except:
-                color_int = 0
-            
-            payload = {
-                "coloringInformation": {
-                    "ColorHex": str(color_int)
-                }
-            }
-            
-            headers = {
-                "Authorization": f"Bearer {token}",
-                "Content-Type": "application/json;odata=verbose",
-                "Accept": "application/json;odata=verbose"
-            }
-            
-            # print(f"Attempting to set color via {api_endpoint}...")
-            response = requests.post(api_endpoint, headers=headers, json=payload)
-            
-            if response.status_code == 204 or response.status_code == 200:
-                print(f"Set folder color for {folder_url} to {color_hex}")
-                return
-            else:
-                print(f"Modern API failed ({response.status_code}). Body: {response.text}")
-
-        except Exception as e:
-            print(f"Failed to set folder color: {e}")
+            file.moveto(dest_path, 1).execute_query()
+        except Exception:
+            self.known_folders.discard(dest_folder_url)
+            raise
+        self.known_folders.add(dest_folder_url)
 
     def scan_folder_structure(self, folder_url):
         """
@@ -223,6 +271,8 @@ class SharePointSorter:
         
         for sub_folder in folder.folders:
              root['folders'].append(sub_folder.name)
+             self.known_folders.add(f"{folder_url.rstrip('/')}/{sub_folder.name}")
+        self.known_folders.add(folder_url)
              
         return root
 
@@ -232,9 +282,7 @@ class SharePointSorter:
         Attempts Modern API (stampcolor) first, then Legacy (vti_colorhex).
         """
         try:
-            import requests
-            
-            # Ensure we have a token
+            # Cached token: no extra MSAL round trip
             token_response = self._acquire_token()
             token = token_response.accessToken
             
@@ -266,7 +314,7 @@ class SharePointSorter:
             }
             
             print(f"Attempting to set color via {api_endpoint}...")
-            response = requests.post(api_endpoint, headers=headers, json=payload)
+            response = self.http.post(api_endpoint, headers=headers, json=payload)
             
             if response.status_code == 204 or response.status_code == 200:
                 print(f"Set folder color for {folder_url} to {color_hex} (Modern API)")
@@ -287,6 +335,161 @@ class SharePointSorter:
         except Exception as e:
             print(f"Failed to set folder color: {e}")
 
+    # =========================================================================
+    # LIBRARY INVENTORY
+    # =========================================================================
+
+    def _rest(self, method, url, body=None):
+        """Direct REST call on the pooled session; returns the decoded JSON body."""
+        headers = {
+            "Authorization": f"Bearer {self._acquire_token().accessToken}",
+            "Accept": "application/json;odata=verbose",
+        }
+        if body is not None:
+            headers["Content-Type"] = "application/json;odata=verbose"
+        response = self.http.request(method, url, headers=headers, data=json.dumps(body) if body is not None else None)
+        response.raise_for_status()
+        return response.json()
+
+    def _list_api(self, folder_url):
+        """REST root of the document library that contains folder_url."""
+        site_path = urlparse(self.site_url).path.rstrip('/')
+        library = folder_url[len(site_path):].strip('/').split('/')[0]
+        return f"{self.site_url.rstrip('/')}/_api/web/GetList('{_odata_str(f'{site_path}/{library}')}')"
+
+    def _file_api(self, file_url):
+        return f"{self.site_url.rstrip('/')}/_api/web/GetFileByServerRelativeUrl('{_odata_str(file_url)}')"
+
+    def _item_entry(self, item):
+        url = item["FileRef"]
+        if item["FSObjType"] == 1:
+            self.known_folders.add(url)
+        return {
+            "id": item["Id"],
+            "name": item["FileLeafRef"],
+            "serverRelativeUrl": url,
+            "modified": item.get("Modified"),
+            "is_folder": item["FSObjType"] == 1,
+        }
+
+    def iter_folder_items(self, folder_url, include_folders=False):
+        """
+        Yields every file below folder_url (recursively), one page at a time.
+
+        Pages through the library's items ordered by ID, which is always indexed,
+        so it keeps working past the list view threshold; only one page is held
+        in memory. Folders seen along the way are added to the known-folder cache.
+        """
+        prefix = folder_url.rstrip('/').lower() + '/'
+        url = (
+            f"{self._list_api(folder_url)}/items?$select=Id,FileRef,FileLeafRef,FSObjType,Modified"
+            f"&$orderby=Id&$top={INVENTORY_PAGE_SIZE}"
+        )
+        while url:
+            page = self._rest("GET", url)["d"]
+            for item in page["results"]:
+                if not item["FileRef"].lower().startswith(prefix):
+                    continue
+                entry = self._item_entry(item)
+                if include_folders or not entry["is_folder"]:
+                    yield entry
+            url = page.get("__next")
+
+    def folder_children(self, folder_url):
+        """Names of the direct files and subfolders of folder_url, in one REST call."""
+        folder_url = folder_url.rstrip('/')
+        data = self._rest(
+            "GET",
+            f"{self.site_url.rstrip('/')}/_api/web/GetFolderByServerRelativeUrl('{_odata_str(folder_url)}')"
+            f"?$select=Files/Name,Folders/Name&$expand=Files,Folders",
+        )["d"]
+        folders = [f["Name"] for f in data["Folders"]["results"]]
+        self.known_folders.add(folder_url)
+        for name in folders:
+            self.known_folders.add(f"{folder_url}/{name}")
+        return {"files": [f["Name"] for f in data["Files"]["results"]], "folders": folders}
+
+    def current_change_token(self, folder_url):
+        data = self._rest("GET", f"{self._list_api(folder_url)}?$select=CurrentChangeToken")
+        return data["d"]["CurrentChangeToken"]["StringValue"]
+
+    def iter_added_files(self, folder_url, change_token):
+        """
+        Yields files added below folder_url after change_token.
+        The generator's return value is the change token to resume from next time.
+        """
+        list_api = self._list_api(folder_url)
+        prefix = folder_url.rstrip('/').lower() + '/'
+        while True:
+            query = {"query": {
+                "__metadata": {"type": "SP.ChangeQuery"},
+                "Add": True, "Move": True, "Item": True, "FetchLimit": 1000,
+                "ChangeTokenStart": {"__metadata": {"type": "SP.ChangeToken"}, "StringValue": change_token},
+            }}
+            changes = self._rest("POST", f"{list_api}/GetChanges", query)["d"]["results"]
+            if not changes:
+                return change_token
+            change_token = changes[-1]["ChangeToken"]["StringValue"]
+            ids = list(dict.fromkeys(c["ItemId"] for c in changes if c["ChangeType"] in _ADDED_CHANGE_TYPES))
+
+            # Resolve item IDs to files in small filtered pages (ID filters are index-backed)
+            for i in range(0, len(ids), 50):
+                id_filter = " or ".join(f"Id eq {item_id}" for item_id in ids[i:i + 50])
+                items = self._rest("GET", f"{list_api}/items?$select=Id,FileRef,FileLeafRef,FSObjType,Modified"
+                                          f"&$filter={quote(id_filter)}")["d"]["results"]
+                for item in items:
+                    if item["FileRef"].lower().startswith(prefix):
+                        entry = self._item_entry(item)
+                        if not entry["is_folder"]:
+                            yield entry
+
+    def sync_new_files(self, folder_url, state_path=SYNC_STATE_PATH, save=True):
+        """
+        Delta inventory: yields files added below folder_url since the previous sync.
+
+        The first sync captures the library's change token and then streams a full
+        inventory; later syncs only walk the change log. The generator's return
+        value is the token to resume from. With save=True it is saved once the
+        generator is exhausted, so an interrupted sync is simply repeated; with
+        save=False the caller saves it (save_sync_token) after processing the files.
+        """
+        change_token = self._load_sync_state(state_path).get(folder_url.rstrip('/').lower())
+        if change_token is None:
+            change_token = self.current_change_token(folder_url)
+            yield from self.iter_folder_items(folder_url)
+        else:
+            change_token = yield from self.iter_added_files(folder_url, change_token)
+
+        if save:
+            self.save_sync_token(folder_url, change_token, state_path)
+        return change_token
+
+    def save_sync_token(self, folder_url, change_token, state_path=SYNC_STATE_PATH):
+        """Records change_token as the point the next sync_new_files of folder_url resumes from."""
+        state = self._load_sync_state(state_path)
+        state[folder_url.rstrip('/').lower()] = change_token
+        os.makedirs(os.path.dirname(state_path) or '.', exist_ok=True)
+        with open(state_path, 'w') as f:
+            json.dump(state, f, indent=2)
+
+    @staticmethod
+    def _load_sync_state(state_path):
+        if not os.path.exists(state_path):
+            return {}
+        with open(state_path, 'r') as f:
+            return json.load(f)
+
+    # =========================================================================
+    # BATCH OPERATIONS
+    # =========================================================================
+
+    def batch(self):
+        """
+        Starts a batch: queue folder creation, moves and permission changes,
+        then send them with execute() as $batch requests.
+        """
+        return SharePointBatch(self)
+
     # =========================================================================
     # PERMISSION MANAGEMENT
     # =========================================================================
@@ -324,29 +527,238 @@ class SharePointSorter:
             
         return permissions
 
+    def get_permission_template(self, folder_url, ttl=PERMISSION_TEMPLATE_TTL):
+        """
+        get_folder_permissions with a TTL cache, for folders used as permission
+        templates (e.g. 'Secure Uploads'). Never use it for the ACL a security
+        decision is made against: a stale entry would fail open.
+        """
+        key = folder_url.rstrip('/').lower()
+        now = time.time()
+        with self._permission_lock:
+            cached = self._permission_templates.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+
+        permissions = self.get_folder_permissions(folder_url)
+        with self._permission_lock:
+            self._permission_templates[key] = (now + ttl, permissions)
+        return permissions
+
+    def permissions_match(self, folder_url, permissions):
+        """
+        True when folder_url already grants exactly these role assignments, i.e. a
+        file inheriting from it has an identical ACL and needs no unique permissions.
+        The destination's ACL is read fresh: if it was broadened since a cached
+        read, skipping unique permissions would expose the file.
+        """
+        try:
+            current = self.get_folder_permissions(folder_url)
+        except Exception:
+            # Typically a destination that does not exist yet: it cannot be relied on
+            return False
+        return _acl_signature(current) == _acl_signature(permissions)
+
     def apply_unique_permissions(self, file_url, permissions):
         """
         Breaks inheritance on the file and applies the provided permissions.
         unique_permissions: List of dicts with 'principal_id' and 'role_def_ids'
+        Sent as a single $batch request (break inheritance + every role assignment).
         """
-        file = self.context.web.get_file_by_server_relative_url(file_url)
-        item = file.listItemAllFields
-        
-        # Break inheritance: copy_role_assignments=False (start clean), clear_subscopes=True
-        item.break_role_inheritance(False, True)
-        self.context.execute_query()
-        print(f"Broken inheritance for {file_url}")
-        
-        # Apply new permissions
+        batch = self.batch()
+        batch.apply_unique_permissions(file_url, permissions)
+        result = batch.execute()[0]
+        if not result["ok"]:
+            raise Exception(f"Could not apply permissions to {file_url}: {result['error']}")
+        print(f"Applied {len(permissions)} permission entries to {file_url}")
+
+
+def _acl_signature(permissions):
+    """Order-insensitive form of a permission list, for ACL comparison."""
+    return frozenset((p['principal_id'], frozenset(p['role_def_ids'])) for p in permissions)
+
+
+def _odata_str(value):
+    """Quotes a value for use inside an OData string literal in a REST URL."""
+    return quote(value.replace("'", "''"), safe="/")
+
+
+class SharePointBatch:
+    """
+    Queues SharePoint write operations and sends them via the REST $batch endpoint.
+
+    Each queued operation may expand into several sub-requests (e.g. one per
+    folder level, or break-inheritance plus one per role assignment). Every
+    sub-request gets its own changeset so one failure does not roll back the
+    others. execute() returns one result per operation, in queue order:
+        {"op", "target", "ok", "status", "error"}
+    """
+    def __init__(self, sorter):
+        self.sorter = sorter
+        self.api_root = f"{sorter.site_url.rstrip('/')}/_api"
+        self.site_path = urlparse(sorter.site_url).path.rstrip('/')
+        self.operations = []
+
+    def __len__(self):
+        return len(self.operations)
+
+    def _queue(self, op, target, sub_requests, folder=None):
+        self.operations.append({"op": op, "target": target, "requests": sub_requests, "folder": folder})
+        return len(self.operations) - 1
+
+    def create_folder(self, folder_url):
+        """
+        Queues creation of every level below the document library.
+        Folders already known to exist are skipped (returns None).
+        """
+        if folder_url in self.sorter.known_folders:
+            return None
+        relative = folder_url.rstrip('/')[len(self.site_path):].strip('/').split('/')
+        levels = ['/'.join([self.site_path] + relative[:i]) for i in range(2, len(relative) + 1)]
+        return self._queue("create_folder", folder_url, [
+            ("POST", f"{self.api_root}/web/folders/add('{_odata_str(level)}')", None) for level in levels
+        ], folder=folder_url)
+
+    def move_file(self, source_file_url, dest_folder_url, new_name=None, overwrite=True):
+        """
+        Queues a move; new_name renames the file on the way (defaults to its current name).
+        With overwrite=False an existing target fails the operation ("... already exists").
+        """
+        file_name = new_name or source_file_url.split('/')[-1]
+        new_url = f"{dest_folder_url.rstrip('/')}/{file_name}"
+        flags = 1 if overwrite else 0
+        return self._queue("move_file", source_file_url, [(
+            "POST",
+            f"{self.api_root}/web/GetFileByServerRelativeUrl('{_odata_str(source_file_url)}')"
+            f"/moveto(newurl='{_odata_str(new_url)}',flags={flags})",
+            None,
+        )], folder=dest_folder_url)
+
+    def apply_unique_permissions(self, file_url, permissions):
+        """Queues break-inheritance followed by every role assignment in permissions."""
+        item = f"{self.api_root}/web/GetFileByServerRelativeUrl('{_odata_str(file_url)}')/ListItemAllFields"
+        sub_requests = [("POST", f"{item}/breakroleinheritance(copyRoleAssignments=false,clearSubscopes=true)", None)]
         for perm in permissions:
-            principal_id = perm['principal_id']
-            role_def_ids = perm['role_def_ids']
-            
-            # Add each role definition individually using ID
-            for rid in role_def_ids:
-                item.role_assignments.add_role_assignment(principal_id, rid)
-                
-            print(f"Added permissions for Principal ID: {principal_id}")
-            
-        self.context.execute_query()
-        print(f"Applied permissions to {file_url}")
+            for rid in perm['role_def_ids']:
+                sub_requests.append((
+                    "POST",
+                    f"{item}/roleassignments/addroleassignment(principalid={perm['principal_id']},roledefid={rid})",
+                    None,
+                ))
+        return self._queue("apply_unique_permissions", file_url, sub_requests)
+
+    def execute(self):
+        """Sends the queue in $batch chunks and maps every response back to its operation."""
+        chunks = self._chunk(self.operations)
+        if len(chunks) <= 1:
+            results = self._send(chunks[0]) if chunks else []
+        else:
+            # Several requests: run each dependency phase (folders -> moves -> permissions)
+            # as concurrent chunks through the scheduler
+            by_operation = {}
+            for op in ("create_folder", "move_file", "apply_unique_permissions"):
+                phase = self._chunk([o for o in self.operations if o["op"] == op])
+                for chunk, chunk_results in zip(phase, self.sorter.scheduler.map(self._send, phase)):
+                    for operation, result in zip(chunk, chunk_results):
+                        by_operation[id(operation)] = result
+            results = [by_operation[id(o)] for o in self.operations]
+        # Keep the known-folder cache in step with what the server just told us
+        for operation, result in zip(self.operations, results):
+            if operation["folder"] is None:
+                continue
+            if result["ok"]:
+                self.sorter.known_folders.add(operation["folder"])
+            else:
+                self.sorter.known_folders.discard(operation["folder"])
+        self.operations = []
+
+        failures = [r for r in results if not r["ok"]]
+        if failures:
+            print(f"Batch finished with {len(failures)}/{len(results)} failed operation(s)")
+        return results
+
+    @staticmethod
+    def _chunk(operations):
+        """Splits operations into request-sized groups without splitting an operation."""
+        chunks, chunk, size = [], [], 0
+        for operation in operations:
+            if chunk and size + len(operation["requests"]) > BATCH_MAX_REQUESTS:
+                chunks.append(chunk)
+                chunk, size = [], 0
+            chunk.append(operation)
+            size += len(operation["requests"])
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    def _send(self, operations):
+        boundary = f"batch_{uuid.uuid4()}"
+        parts = []
+        for operation in operations:
+            for method, url, body in operation["requests"]:
+                changeset = f"changeset_{uuid.uuid4()}"
+                payload = json.dumps(body) if body is not None else ""
+                parts.append(
+                    f"--{boundary}\r\n"
+                    f"Content-Type: multipart/mixed; boundary={changeset}\r\n\r\n"
+                    f"--{changeset}\r\n"
+                    "Content-Type: application/http\r\n"
+                    "Content-Transfer-Encoding: binary\r\n\r\n"
+                    f"{method} {url} HTTP/1.1\r\n"
+                    "Content-Type: application/json;odata=verbose\r\n"
+                    "Accept: application/json;odata=verbose\r\n\r\n"
+                    f"{payload}\r\n"
+                    f"--{changeset}--\r\n"
+                )
+        body = "".join(parts) + f"--{boundary}--\r\n"
+
+        token = self.sorter._acquire_token().accessToken
+        try:
+            response = self.sorter.http.post(
+                f"{self.api_root}/$batch",
+                data=body.encode('utf-8'),
+                headers={
+                    "Authorization": f"Bearer {token}",
+                    "Content-Type": f"multipart/mixed; boundary={boundary}",
+                    "Accept": "application/json;odata=verbose",
+                },
+            )
+            response.raise_for_status()
+            statuses = self._parse_response(response.text)
+        except Exception as e:
+            return [self._result(o, 0, f"Batch request failed: {e}") for o in operations]
+
+        results = []
+        for operation in operations:
+            taken, statuses = statuses[:len(operation["requests"])], statuses[len(operation["requests"]):]
+            if len(taken) < len(operation["requests"]):
+                results.append(self._result(operation, 0, "No response for operation in batch"))
+                continue
+            failed = [(code, error) for code, error in taken if code >= 400]
+            code, error = failed[0] if failed else taken[-1]
+            results.append(self._result(operation, code, error if failed else None))
+        return results
+
+    @staticmethod
+    def _parse_response(text):
+        """Extracts (status, error message) for every sub-response, in order."""
+        segments = re.split(r"^HTTP/1\.1 (\d{3})[^\r\n]*\r?\n", text, flags=re.M)
+        statuses = []
+        for code, rest in zip(segments[1::2], segments[2::2]):
+            code = int(code)
+            error = None
+            if code >= 400:
+                # Body follows the sub-response headers and runs until the next boundary line
+                body = re.split(r"\r?\n\r?\n", rest, maxsplit=1)[-1]
+                body = re.split(r"^--", body, maxsplit=1, flags=re.M)[0].strip()
+                try:
+                    error = json.loads(body)["error"]["message"]["value"]
+                except Exception:
+                    error = body or f"HTTP {code}"
+            statuses.append((code, error))
+        return statuses
+
+    @staticmethod
+    def _result(operation, status, error):
+        return {"op": operation["op"], "target": operation["target"], "ok": error is None and status < 400,
+                "status": status, "error": error}
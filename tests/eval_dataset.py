@@ -14,4 +14,38 @@ EVAL_CASES = [
         "expected_rename_required": False,
         "criteria": "The agent must recognize 'Project Alpha' and sort it into the specific project subfolder."
     }
-]
\ No newline at end of file
+]
+# Templates for generated cases: (content template, expected folder template, rename expected)
+VENDORS = ["AWS", "Stripe", "Salesforce", "Adobe", "Zoom", "Slack", "Atlassian", "Dropbox"]
+PROJECTS = ["Alpha", "Beta", "Phoenix", "Orion", "Titan", "Nova"]
+CASE_TEMPLATES = [
+    ("INVOICE #{number}\nVendor: {vendor}\nTotal: ${amount}\nDate: 2026-{month:02d}-{day:02d}\nDescription: Monthly subscription.",
+     "Finance/Invoices", "invoice_{number}_{noise}.txt", True),
+    ("Project {project}: status update for sprint {number}. Tasks completed and risks for {project}.",
+     "Projects/{project}", "{project_lower}_notes_{noise}.txt", True),
+    ("Meeting notes - Project {project} kickoff.\nAttendees: engineering, design.\nNext steps for {project}.",
+     "Projects/{project}", "meeting_{number}.txt", False),
+    ("Grocery list: milk, eggs, bread, {number} apples.",
+     "Unsorted", "list_{noise}.txt", False),
+]
+
+def generate_cases(count, seed=0):
+    """Deterministic synthetic cases for load-testing the harness (same seed -> same cases)."""
+    import random
+    rng = random.Random(seed)
+    cases = []
+    for i in range(count):
+        content, folder, filename, rename = rng.choice(CASE_TEMPLATES)
+        project = rng.choice(PROJECTS)
+        fields = {
+            "number": rng.randint(1000, 9999), "vendor": rng.choice(VENDORS), "amount": f"{rng.uniform(10, 5000):.2f}",
+            "month": rng.randint(1, 12), "day": rng.randint(1, 28), "project": project,
+            "project_lower": project.lower(), "noise": "".join(rng.choices("abcdef0123456789", k=6)),
+        }
+        cases.append({
+            "input_file": f"{i:05d}_{filename.format(**fields)}",
+            "content": content.format(**fields),
+            "expected_folder": folder.format(**fields),
+            "expected_rename_required": rename,
+        })
+    return cases
@@ -1,103 +1,177 @@
 # tests/evaluator.py
+import argparse
+import asyncio
 import json
-import shutil
 import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
 from pathlib import Path
 from langchain_core.messages import HumanMessage, SystemMessage
 
-# 1. Define the path first
-VECTOR_DB_PATH = "./data/sorterra_memory"
-
-def run_evals():
-    """Iterates through test cases, runs the agent, and grades the results."""
-    
-    # 2. CLEAR MEMORY FIRST (Before importing the agent/tools)
-    if Path(VECTOR_DB_PATH).exists():
-        print(f"--- Clearing vector memory at {VECTOR_DB_PATH} ---")
-        try:
-            shutil.rmtree(VECTOR_DB_PATH)
-        except PermissionError:
-            print("⚠️ Warning: Could not clear memory. Ensure no other processes are using the DB.")
-
-    # 3. IMPORT AGENT NOW (After the file lock is gone)
-    from core.agent import app, model_thinking
-    from tests.eval_dataset import EVAL_CASES
-
-    results = []
-    test_dir = Path("./data/test_folder")
-    test_dir.mkdir(parents=True, exist_ok=True)
-
-    print(f"\n{'='*60}\nSTARTING AGENTIC EVALUATIONS\n{'='*60}")
-    
-    for case in EVAL_CASES:
-        # Setup: Create the physical file for the agent to analyze
-        test_path = test_dir / case['input_file']
-        test_path.write_text(case["content"])
+REPO_ROOT = Path(__file__).resolve().parent.parent
+EVAL_CONCURRENCY = 16
+EVAL_RECIPE = {
+    "name": "Project Sort",
+    "rules": [
+        "1. If file is an invoice, move to 'Finance/Invoices'.",
+        "2. If it mentions a Project (e.g. Alpha), move to 'Projects/[Name]'.",
+        "3. Otherwise, 'Unsorted'."
+    ]
+}
+
+def _normalize(folder):
+    return "/".join(part for part in str(folder).replace("\\", "/").lower().split("/") if part)
+
+async def run_evals(cases, concurrency=EVAL_CONCURRENCY, judge=False, routing=None):
+    """
+    Runs every case concurrently and grades placement with code.
 
-        print(f"\n[TEST] File: {case['input_file']}")
+    The run lives in a throwaway workspace: the process chdirs into it before
+    the agent is imported, so checkpoints, journal, indexes and vector memory
+    never touch ./data. Each case additionally gets its own input/sorted
+    directories and its own Chroma collection, so cases cannot learn from
+    each other and results do not depend on ordering.
+    """
+    workspace = Path(tempfile.mkdtemp(prefix="sorterra-eval-"))
+    sys.path.insert(0, str(REPO_ROOT))
+    os.chdir(workspace)
+
+    # Import the agent only now, so its relative data paths resolve inside the workspace
+    from core.agent import open_app, model_thinking
+    from core.storage import LocalStorage
+    from core.tools import STORAGE, MEMORIES, names
+
+    run_id = uuid.uuid4().hex[:8]
+    limit = asyncio.Semaphore(concurrency)
+    print(f"\n{'='*60}\nSTARTING AGENTIC EVALUATIONS ({len(cases)} cases, concurrency {concurrency})\n"
+          f"Workspace: {workspace}\n{'='*60}")
+
+    async def run_case(index, case):
+        key = f"eval-{run_id}-{index:05d}"
+        case_dir = workspace / "cases" / f"{index:05d}"
+        inbox, sorted_root = case_dir / "inbox", case_dir / "sorted"
+        inbox.mkdir(parents=True, exist_ok=True)
+        test_path = inbox / case['input_file']
+        test_path.write_text(case["content"])
 
-        # Run the Sorterra Agent
         inputs = {
             "messages": [HumanMessage(content=f"Sort this file: {test_path}")],
-            "recipe": {
-                "name": "Project Sort",
-                "rules": [
-                    "1. If file is an invoice, move to 'Finance/Invoices'.",
-                    "2. If it mentions a Project (e.g. Alpha), move to 'Projects/[Name]'.",
-                    "3. Otherwise, 'Unsorted'."
-                ]
-            },
+            "recipe": EVAL_RECIPE,
             "current_file": str(test_path)
         }
+        # Near-duplicate hints would leak decisions between cases
+        config = {"configurable": {"thread_id": key, "storage": key, "memory": key, "near_duplicate_mode": "off"}}
+        if routing:
+            config["configurable"]["model_routing"] = routing
+        STORAGE[key] = LocalStorage(sorted_root, names)
+
+        async with limit:
+            try:
+                final_state = await app.ainvoke(inputs, config)
+                report = grade_placement(case, final_state, sorted_root)
+                if judge and case.get("criteria"):
+                    report.update(await asyncio.to_thread(grade_agent_action, case, final_state, model_thinking))
+            except Exception as e:
+                report = {"input": case['input_file'], "grade": "ERROR", "explanation": str(e)}
+            finally:
+                STORAGE.pop(key, None)
+                MEMORIES.pop(key, None)
 
-        try:
-            # Execute graph and capture final state
-            final_state = app.invoke(inputs)
-            
-            # Grading Logic (Pass model_thinking explicitly)
-            report = grade_agent_action(case, final_state, model_thinking)
-            results.append(report)
-            
-            status = "✅ PASS" if report['grade'] == 'PASS' else "❌ FAIL"
-            print(f"RESULT: {status}")
-            print(f"EXPLANATION: {report['judge_explanation']}")
-        
-        except Exception as e:
-            print(f"ERROR processing {case['input_file']}: {str(e)}")
+        status = {"PASS": "✅ PASS", "FAIL": "❌ FAIL"}.get(report['grade'], "⚠️ ERROR")
+        print(f"[{index + 1}/{len(cases)}] {case['input_file']}: {status} - {report['explanation']}")
+        return report
+
+    start = time.time()
+    async with open_app() as app:
+        results = await asyncio.gather(*(run_case(i, case) for i, case in enumerate(cases)))
+    elapsed = time.time() - start
 
     # Summary Statistics
     print(f"\n{'='*60}")
     pass_count = sum(1 for r in results if r['grade'] == 'PASS')
     total = len(results)
     score = (pass_count / total) * 100 if total > 0 else 0
-    print(f"FINAL SCORE: {pass_count}/{total} ({score:.1f}%)")
-    print(f"{'='*60}\n")
+    print(f"FINAL SCORE: {pass_count}/{total} ({score:.1f}%) in {elapsed:.1f}s")
+    by_folder = {}
+    for case, report in zip(cases, results):
+        passed, seen = by_folder.get(case['expected_folder'], (0, 0))
+        by_folder[case['expected_folder']] = (passed + (report['grade'] == 'PASS'), seen + 1)
+    for folder, (passed, seen) in sorted(by_folder.items()):
+        print(f"  {folder}: {passed}/{seen}")
+    # Accuracy per model route ("quick" = Haiku only, "escalated" = Haiku then Sonnet, "thinking" = Sonnet only)
+    by_route = {}
+    for report in results:
+        by_route.setdefault(report.get('route') or 'none', []).append(report)
+    for route, reports in sorted(by_route.items()):
+        passed = sum(1 for r in reports if r['grade'] == 'PASS')
+        latencies = [r['decision_seconds'] for r in reports if r.get('decision_seconds') is not None]
+        median = f", median decision {statistics.median(latencies):.2f}s" if latencies else ""
+        print(f"  route {route}: {passed}/{len(reports)}{median}")
+    report_path = workspace / "eval_report.json"
+    report_path.write_text(json.dumps(results, indent=2))
+    print(f"Report: {report_path}\n{'='*60}\n")
+    return results
+
+def grade_placement(case, final_state, sorted_root):
+    """Deterministic grade: the last move must target expected_folder and the file must be there."""
+    tool_calls = [tc for msg in final_state["messages"] for tc in (getattr(msg, 'tool_calls', None) or [])]
+    moves = [tc for tc in tool_calls if tc['name'] == 'move_file']
+    renamed = any(tc['name'] == 'rename_file' for tc in tool_calls)
+
+    expected = _normalize(case['expected_folder'])
+    chosen = _normalize(moves[-1]['args'].get('destination_folder', '')) if moves else None
+    on_disk = sorted_root.is_dir() and any(
+        _normalize(p.parent.relative_to(sorted_root)) == expected for p in sorted_root.rglob('*') if p.is_file()
+    )
+
+    if not moves:
+        grade, explanation = "FAIL", "No move_file call."
+    elif chosen != expected:
+        grade, explanation = "FAIL", f"Moved to '{chosen}', expected '{expected}'."
+    elif not on_disk:
+        grade, explanation = "FAIL", f"Chose '{chosen}' but the file is not in {sorted_root / case['expected_folder']}."
+    else:
+        grade, explanation = "PASS", f"Moved to '{chosen}'."
+
+    return {
+        "input": case['input_file'],
+        "grade": grade,
+        "explanation": explanation,
+        "destination": chosen,
+        "rename_ok": renamed or not case.get('expected_rename_required', False),
+        "tool_calls": len(tool_calls),
+        "route": final_state.get("decision_route"),
+        "decision_seconds": final_state.get("decision_seconds"),
+        "decision_tokens": final_state.get("decision_tokens"),
+    }
 
 def grade_agent_action(case, final_state, model_thinking):
-    """Uses LLM-as-a-judge to evaluate the agent's performance."""
-    
+    """Uses LLM-as-a-judge for the subjective part of a case ('criteria'); placement is graded in code."""
+
     all_tool_calls = []
     for msg in final_state["messages"]:
         if hasattr(msg, 'tool_calls') and msg.tool_calls:
             all_tool_calls.extend(msg.tool_calls)
-    
+
     reasoning = final_state["messages"][-1].content
 
     system_prompt = "You are an impartial judge evaluating the performance of an AI file-management agent."
-    
+
     judge_task = f"""
     Evaluate the following agent execution against the Target Criteria.
 
     ### TARGET CRITERIA
-    - Required Folder: {case['expected_folder']}
     - Specific Goal: {case['criteria']}
-    
+
     ### AGENT PERFORMANCE
     - Final Reasoning Provided: "{reasoning}"
     - Total Tool Calls Executed: {json.dumps(all_tool_calls, indent=2)}
-    
+
     ### EVALUATION REQUIREMENTS
-    1. GRADE: 'PASS' if ANY tool call correctly moved the file to '{case['expected_folder']}'. 
+    1. GRADE: 'PASS' if the agent met the Specific Goal. Folder placement is checked separately.
     2. EXPLANATION: Provide a concise 1-2 sentence justification.
 
     ### OUTPUT FORMAT
@@ -107,12 +181,12 @@ def grade_agent_action(case, final_state, model_thinking):
         "explanation": "concise explanation"
     }}
     """
-    
+
     response = model_thinking.invoke([
         SystemMessage(content=system_prompt),
         HumanMessage(content=judge_task)
     ])
-    
+
     content = response.content.strip()
     if "```json" in content:
         content = content.split("```json")[1].split("```")[0].strip()
@@ -122,17 +196,26 @@ def grade_agent_action(case, final_state, model_thinking):
     try:
         judge_output = json.loads(content)
     except json.JSONDecodeError:
-        return {
-            "input": case['input_file'],
-            "grade": "FAIL",
-            "judge_explanation": f"Judge returned invalid JSON: {content}"
-        }
-    
+        return {"judge_grade": "FAIL", "judge_explanation": f"Judge returned invalid JSON: {content}"}
+
     return {
-        "input": case['input_file'],
-        "grade": judge_output.get('grade', 'FAIL'),
+        "judge_grade": judge_output.get('grade', 'FAIL'),
         "judge_explanation": judge_output.get('explanation', 'No explanation provided.')
     }
 
 if __name__ == "__main__":
-    run_evals()
\ No newline at end of file
+    from tests.eval_dataset import EVAL_CASES, generate_cases
+
+    parser = argparse.ArgumentParser(description="Sorterra evaluation harness")
+    parser.add_argument("--generated", type=int, default=0, metavar="N",
+                        help="Run N synthetic cases instead of EVAL_CASES")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, default=EVAL_CONCURRENCY)
+    parser.add_argument("--routing", choices=["confidence", "thinking"],
+                        help="Model routing to evaluate (default: core.routing.MODEL_ROUTING)")
+    parser.add_argument("--judge", action="store_true",
+                        help="Also grade each case's subjective 'criteria' with the LLM judge")
+    args = parser.parse_args()
+
+    cases = generate_cases(args.generated, args.seed) if args.generated else EVAL_CASES
+    asyncio.run(run_evals(cases, args.concurrency, args.judge, args.routing))
@@ -0,0 +1,105 @@
+# tests/test_sharepoint_batch.py
+import sys
+from pathlib import Path
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "salesforce_connection"))
+from mock_sharepoint import MockSharePoint, mock_sorter
+from sharepoint_client import BATCH_MAX_REQUESTS
+
+LIBRARY = "/sites/Test/Shared Documents"
+INBOX = f"{LIBRARY}/Inbox"
+SORTED = f"{LIBRARY}/Sorted"
+
+@pytest.fixture
+def server():
+    mock = MockSharePoint(folders=[LIBRARY, INBOX, SORTED]).start()
+    mock.retry_after = 0
+    yield mock
+    mock.stop()
+
+def _batch_posts(server):
+    return [path for method, path in server.requests if method == "POST" and path.endswith("/_api/$batch")]
+
+def test_partial_failures_map_back_to_their_operations(server):
+    for name in ("a.pdf", "b.pdf", "c.pdf"):
+        server.add_file(f"{INBOX}/{name}", name.encode())
+    server.add_file(f"{SORTED}/c.pdf", b"someone else's")
+    server.fail_urls.add(f"{SORTED}/Broken")
+
+    batch = mock_sorter(server).batch()
+    batch.move_file(f"{INBOX}/a.pdf", SORTED)
+    batch.create_folder(f"{SORTED}/Broken")
+    batch.move_file(f"{INBOX}/missing.pdf", SORTED)
+    batch.move_file(f"{INBOX}/b.pdf", SORTED)
+    batch.move_file(f"{INBOX}/c.pdf", SORTED, overwrite=False)
+    results = batch.execute()
+
+    assert [(r["op"], r["ok"]) for r in results] == [
+        ("move_file", True), ("create_folder", False), ("move_file", False), ("move_file", True), ("move_file", False),
+    ]
+    assert results[1]["error"] == "Injected failure"
+    assert "missing.pdf" in results[2]["error"]
+    assert "already exists" in results[4]["error"]
+    assert f"{SORTED}/a.pdf" in server.files and f"{SORTED}/b.pdf" in server.files
+    assert server.files[f"{SORTED}/c.pdf"] == b"someone else's"
+    assert len(_batch_posts(server)) == 1
+
+def test_large_batches_are_chunked(server):
+    count = BATCH_MAX_REQUESTS + 50
+    for i in range(count):
+        server.add_file(f"{INBOX}/{i}.txt", b"x")
+
+    batch = mock_sorter(server).batch()
+    for i in range(count):
+        batch.move_file(f"{INBOX}/{i}.txt", SORTED)
+    results = batch.execute()
+
+    assert len(results) == count and all(r["ok"] for r in results)
+    assert [r["target"] for r in results] == [f"{INBOX}/{i}.txt" for i in range(count)]
+    assert len(_batch_posts(server)) == 2
+    assert all(f"{SORTED}/{i}.txt" in server.files for i in range(count))
+
+def test_known_folders_are_not_created_again(server):
+    server.add_file(f"{INBOX}/a.pdf", b"a")
+    server.add_file(f"{INBOX}/b.pdf", b"b")
+    sorter = mock_sorter(server)
+    target = f"{SORTED}/Finance/Invoices"
+
+    batch = sorter.batch()
+    batch.create_folder(target)
+    batch.move_file(f"{INBOX}/a.pdf", target)
+    assert all(r["ok"] for r in batch.execute())
+    assert target in sorter.known_folders and target in server.folders
+
+    batch = sorter.batch()
+    assert batch.create_folder(target) is None
+    batch.move_file(f"{INBOX}/b.pdf", target)
+    assert len(batch) == 1
+    assert all(r["ok"] for r in batch.execute())
+    assert f"{target}/b.pdf" in server.files
+
+def test_failed_folder_is_dropped_from_known_folders(server):
+    sorter = mock_sorter(server)
+    target = f"{SORTED}/Broken"
+    sorter.known_folders.discard(target)
+    server.fail_urls.add(target)
+
+    batch = sorter.batch()
+    batch.create_folder(target)
+    assert not batch.execute()[0]["ok"]
+    assert target not in sorter.known_folders
+
+def test_throttled_batches_are_retried(server):
+    server.add_file(f"{INBOX}/a.pdf", b"a")
+    server.throttle_next = 2
+    sorter = mock_sorter(server)
+
+    batch = sorter.batch()
+    batch.move_file(f"{INBOX}/a.pdf", SORTED)
+    results = batch.execute()
+
+    assert results[0]["ok"]
+    assert f"{SORTED}/a.pdf" in server.files
+    assert len(_batch_posts(server)) == 3
+    assert sorter.scheduler.counters["throttled"] == 2
@@ -0,0 +1,94 @@
+# tests/test_sharepoint_storage.py
+import sys
+from pathlib import Path
+import pytest
+import requests
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "salesforce_connection"))
+sys.path.insert(0, str(REPO_ROOT))
+from mock_sharepoint import MockSharePoint, mock_sorter
+from content_reader import SharePointContentReader
+from core.storage import NameCollision, SharePointStorage
+
+LIBRARY = "/sites/Test/Shared Documents"
+INBOX = f"{LIBRARY}/Inbox"
+SORTED = f"{LIBRARY}/Sorted"
+
+@pytest.fixture
+def server():
+    mock = MockSharePoint(folders=[LIBRARY, INBOX, SORTED]).start()
+    mock.retry_after = 0
+    yield mock
+    mock.stop()
+
+@pytest.fixture
+def storage(server, tmp_path, monkeypatch):
+    # Delta sync state is written below ./data
+    monkeypatch.chdir(tmp_path)
+    sorter = mock_sorter(server)
+    return SharePointStorage(sorter, SORTED, SharePointContentReader(sorter, cache_dir=tmp_path / "cache"))
+
+def test_reserve_skips_existing_and_reserved_names(server, storage):
+    server.add_folder(f"{SORTED}/Finance")
+    server.add_file(f"{SORTED}/Finance/inv.pdf")
+
+    assert storage.reserve("Finance", "inv.pdf") == f"{SORTED}/Finance/inv_1.pdf"
+    assert storage.reserve("Finance", "INV.pdf") == f"{SORTED}/Finance/INV_2.pdf"
+    assert storage.reserve("Finance/New", "inv.pdf") == f"{SORTED}/Finance/New/inv.pdf"
+
+def test_move_creates_folders_and_never_overwrites(server, storage):
+    server.add_file(f"{INBOX}/a.pdf", b"ours")
+    server.add_file(f"{INBOX}/b.pdf", b"second")
+
+    target = storage.reserve("Finance/Invoices", "a.pdf")
+    storage.move(f"{INBOX}/a.pdf", target)
+    assert server.files[target] == b"ours" and f"{INBOX}/a.pdf" not in server.files
+
+    # Someone else adds the name between our reservation and the move
+    taken = storage.reserve("Finance/Invoices", "b.pdf")
+    server.add_file(taken, b"theirs")
+    with pytest.raises(NameCollision):
+        storage.move(f"{INBOX}/b.pdf", taken)
+    assert server.files[taken] == b"theirs"
+
+    retry = storage.reserve("Finance/Invoices", "b.pdf")
+    assert retry == f"{SORTED}/Finance/Invoices/b_1.pdf"
+    storage.move(f"{INBOX}/b.pdf", retry)
+    assert server.files[retry] == b"second"
+
+def test_list_files_returns_direct_children(server, storage):
+    server.add_folder(f"{INBOX}/Sub")
+    server.add_file(f"{INBOX}/a.pdf")
+    server.add_file(f"{INBOX}/Sub/b.pdf")
+
+    assert storage.list_files(INBOX) == [f"{INBOX}/a.pdf"]
+    assert storage.list_folders(INBOX) == ["Sub"]
+
+def test_delta_listing_is_committed_only_once_files_are_sorted(server, storage):
+    server.add_folder(f"{INBOX}/Sub")
+    server.add_file(f"{INBOX}/a.pdf")
+    server.add_file(f"{INBOX}/Sub/b.pdf")
+
+    assert sorted(storage.list_new_files(INBOX)) == [f"{INBOX}/Sub/b.pdf", f"{INBOX}/a.pdf"]
+    storage.move(f"{INBOX}/a.pdf", storage.reserve("Docs", "a.pdf"))
+    assert not storage.commit_listing(INBOX)
+    assert storage.list_new_files(INBOX) == [f"{INBOX}/Sub/b.pdf"]
+
+    storage.move(f"{INBOX}/Sub/b.pdf", storage.reserve("Docs", "b.pdf"))
+    assert storage.commit_listing(INBOX)
+    server.add_file(f"{INBOX}/c.pdf")
+    assert storage.list_new_files(INBOX) == [f"{INBOX}/c.pdf"]
+
+def test_exists_only_reports_missing_files_on_404(server, storage):
+    server.add_file(f"{INBOX}/a.pdf", b"a")
+
+    assert storage.exists(f"{INBOX}/a.pdf")
+    assert not storage.exists(f"{INBOX}/missing.pdf")
+
+    server.throttle_next = 1
+    assert storage.exists(f"{INBOX}/a.pdf")
+
+    server.fail_urls.add(f"{INBOX}/a.pdf")
+    with pytest.raises(requests.HTTPError):
+        storage.exists(f"{INBOX}/a.pdf")